@@ -1,23 +1,29 @@
 import streamlit as st
+import streamlit.components.v1 as components
 import pandas as pd
+import numpy as np
 import matplotlib.pyplot as plt
 import seaborn as sns
+import hashlib
+import io
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
 from datetime import datetime
+from urllib.parse import urlencode
 
-# Configuración de usuarios y contraseñas
-USUARIOS = {
-    "wiga": "contraseña_secreta123",
-    "admin": "admin123",
-    "dany":"futbol123"
-}
+import credenciales
 
-def visualizar_estadisticas_pendientes(pendientes_df: pd.DataFrame, titulo: str = "Reclamos Pendientes"):
+def visualizar_estadisticas_pendientes(pendientes_df: pd.DataFrame, titulo: str = "Reclamos Pendientes", clave_vista: tuple = None):
     """
     Muestra estadísticas visuales de reclamos pendientes en dos columnas.
     
     Args:
         pendientes_df (pd.DataFrame): DataFrame con los reclamos pendientes
         titulo (str): Título principal de la sección
+        clave_vista (tuple): Pestaña, hash del dataset y filtros, para la caché de gráficos
     """
     if not pendientes_df.empty:
         st.header(titulo)
@@ -25,48 +31,135 @@ def visualizar_estadisticas_pendientes(pendientes_df: pd.DataFrame, titulo: str
         
         with col1:
             # Gráfico de causas
-            fig = plt.figure(figsize=(10, 5))
-            sns.countplot(y='CAUSA SINIESTRO', data=pendientes_df, 
-                        order=pendientes_df['CAUSA SINIESTRO'].value_counts().index)
-            plt.title(f'Causas de {titulo}')
-            plt.xlabel('Cantidad')
-            plt.ylabel('Causa del siniestro')
-            st.pyplot(fig)
-            plt.close(fig)
+            def grafico_causas():
+                fig = plt.figure(figsize=(10, 5))
+                sns.countplot(y='CAUSA SINIESTRO', data=pendientes_df, 
+                            order=pendientes_df['CAUSA SINIESTRO'].value_counts().index)
+                plt.title(f'Causas de {titulo}')
+                plt.xlabel('Cantidad')
+                plt.ylabel('Causa del siniestro')
+                return fig
+            mostrar_figura(clave_vista and clave_vista + (titulo, 'causas'), grafico_causas)
             
         with col2:
             # Gráfico de días pendientes
-            pendientes_df['DIAS PENDIENTES'] = (pendientes_df['FECHA NOTIFICACION SINIESTRO'] - pendientes_df['FECHA SINIESTRO']).dt.days
-            
-            fig = plt.figure(figsize=(10, 5))
-            sns.histplot(pendientes_df['DIAS PENDIENTES'], bins=20, kde=True, color='salmon')
-            plt.title(f'Distribución de Días en {titulo}')
-            plt.xlabel('Días transcurridos')
-            plt.ylabel('Cantidad de reclamos')
-            st.pyplot(fig)
-            plt.close(fig)
+            def grafico_dias():
+                pendientes_df['DIAS PENDIENTES'] = (pendientes_df['FECHA NOTIFICACION SINIESTRO'] - pendientes_df['FECHA SINIESTRO']).dt.days
+                
+                fig = plt.figure(figsize=(10, 5))
+                sns.histplot(pendientes_df['DIAS PENDIENTES'], bins=20, kde=True, color='salmon')
+                plt.title(f'Distribución de Días en {titulo}')
+                plt.xlabel('Días transcurridos')
+                plt.ylabel('Cantidad de reclamos')
+                return fig
+            mostrar_figura(clave_vista and clave_vista + (titulo, 'dias'), grafico_dias)
     else:
         st.info(f"No hay {titulo.lower()} para los filtros seleccionados")
         
-# Función de autenticación básica
+# Cookie del navegador con el token de sesión firmado
+COOKIE_SESION = "reclamos_sesion"
+
+def escribir_cookie_sesion(token: str = None):
+    """
+    Guarda (o borra, sin token) la cookie de sesión en el navegador. Streamlit
+    no escribe cookies, así que se hace con un script en un componente HTML.
+    El token nunca se pone en la URL para que no viaje en los enlaces compartidos.
+    """
+    if token:
+        valor = f"{COOKIE_SESION}={token}; Max-Age={credenciales.DURACION_SESION}"
+    else:
+        valor = f"{COOKIE_SESION}=; Max-Age=0"
+    components.html(
+        "<script>"
+        "const seguro = window.parent.location.protocol === 'https:' ? '; Secure' : '';"
+        f"window.parent.document.cookie = {json.dumps(valor + '; Path=/; SameSite=Strict')} + seguro;"
+        "</script>",
+        height=0,
+    )
+
+@st.cache_resource
+def servicios_autenticacion():
+    """
+    Backend de credenciales, firmador de tokens y limitador de intentos,
+    compartidos por todas las sesiones del servidor.
+    """
+    backend = credenciales.crear_backend()
+    return backend, credenciales.FirmadorSesiones(backend=backend), credenciales.LimitadorIntentos()
+
+# Definir solo si la app corre detrás de un proxy inverso que agrega X-Forwarded-For
+PROXY_CONFIABLE = bool(os.environ.get("RECLAMOS_PROXY_CONFIABLE"))
+
+def ip_cliente():
+    """
+    IP del cliente para el límite de intentos. Detrás de un proxy confiable se
+    toma la última entrada de X-Forwarded-For (la que agregó el proxy; las
+    anteriores las controla el cliente). Sin proxy configurado la cabecera se
+    ignora, porque cualquier cliente puede enviarla.
+    """
+    if PROXY_CONFIABLE:
+        reenviada = st.context.headers.get("X-Forwarded-For")
+        if reenviada:
+            return reenviada.split(",")[-1].strip()
+    return st.context.ip_address
+
+# Función de autenticación
 def autenticacion():
     if 'autenticado' not in st.session_state:
         st.session_state.autenticado = False
-        
-    if not st.session_state.autenticado:
-        with st.container():
-            st.title("🔒 Inicio de Sesión")
-            usuario = st.text_input("Usuario")
-            contraseña = st.text_input("Contraseña", type="password")
-            
-            if st.button("Ingresar"):
-                if USUARIOS.get(usuario) == contraseña:
-                    st.session_state.autenticado = True
-                    st.rerun()
-                else:
-                    st.error("❌ Usuario o contraseña incorrectos")
-        return False
-    return True
+
+    backend, firmador, limitador = servicios_autenticacion()
+
+    if st.session_state.autenticado:
+        # La sesión abierta termina si el usuario se eliminó o cambió su contraseña
+        token = st.session_state.get('token_sesion')
+        if token is None or firmador.validar(token):
+            return True
+        st.session_state.autenticado = False
+        st.session_state.pop('token_sesion')
+        st.session_state._borrar_cookie = True
+
+    # Reconexión o pestaña nueva: el token firmado de la cookie evita pedir la contraseña
+    token = st.context.cookies.get(COOKIE_SESION)
+    if token and not st.session_state.get('_cerro_sesion'):
+        usuario = firmador.validar(token)
+        if usuario:
+            st.session_state.autenticado = True
+            st.session_state.usuario = usuario
+            st.session_state.token_sesion = token
+            return True
+
+    if st.session_state.pop('_borrar_cookie', False):
+        escribir_cookie_sesion()
+
+    with st.container():
+        st.title("🔒 Inicio de Sesión")
+        if hasattr(backend, "tiene_usuarios") and not backend.tiene_usuarios():
+            st.warning("⚠️ No hay usuarios configurados. Créalos con `python credenciales.py agregar <usuario>`")
+        usuario = st.text_input("Usuario")
+        contraseña = st.text_input("Contraseña", type="password")
+
+        if st.button("Ingresar"):
+            claves_limite = [f"usuario:{usuario}"]
+            ip = ip_cliente()
+            if ip:
+                claves_limite.append(f"ip:{ip}")
+            espera = max(limitador.segundos_bloqueo(clave) for clave in claves_limite)
+            if espera > 0:
+                st.error(f"⛔ Demasiados intentos fallidos. Intenta de nuevo en {int(espera // 60) + 1} minutos")
+            elif backend.autenticar(usuario, contraseña):
+                for clave in claves_limite:
+                    limitador.reiniciar(clave)
+                st.session_state.autenticado = True
+                st.session_state.usuario = usuario
+                st.session_state.token_sesion = firmador.emitir(usuario)
+                st.session_state._cookie_pendiente = True
+                st.session_state._cerro_sesion = False
+                st.rerun()
+            else:
+                for clave in claves_limite:
+                    limitador.registrar_fallo(clave)
+                st.error("❌ Usuario o contraseña incorrectos")
+    return False
 
 # Verificar autenticación antes de mostrar la app
 if not autenticacion():
@@ -76,11 +169,456 @@ if not autenticacion():
 # Funciones auxiliares
 # ==============================================
 
-def load_data(uploaded_file):
+# Directorio donde se guardan los archivos subidos, identificados por su hash,
+# para que un enlace compartido pueda abrir el mismo dataset sin volver a subirlo
+DIRECTORIO_DATASETS = os.environ.get(
+    "RECLAMOS_DIR_DATASETS", os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache_datasets")
+)
+
+# Retención de los datos de reclamos: un archivo sin uso durante este tiempo se
+# borra del disco y de las cachés; además se guardan como máximo MAX_DATASETS
+RETENCION_DATASETS = int(os.environ.get("RECLAMOS_RETENCION_DATASETS_HORAS", 72)) * 3600
+MAX_DATASETS = 50
+MAX_DATASETS_EN_MEMORIA = 12
+MAX_RESULTADOS_EN_CACHE = 200
+
+# Columnas de fecha de cada tipo de archivo
+FECHAS_VIDA = ('FECHA SINIESTRO', 'FECHA NOTIFICACION SINIESTRO', 'FECHA DE CIERRE/INDEMNIZACION', 'INICIO VIGENCIA', 'FIN VIGENCIA')
+FECHAS_HOGAR = FECHAS_VIDA
+FECHAS_CUOTA = ('FECHA SINIESTRO', 'FECHA NOTIFICACION SINIESTRO')
+
+# Filtros del sidebar que se guardan en la URL
+FILTROS_URL = [
+    "año_vida", "prod_vida", "top_vida", "bins_vida",
+    "año_hogar", "prod_hogar", "top_hogar", "bins_hogar",
+    "año_cuota", "prod_cuota", "top_cuota", "bins_cuota",
+]
+
+def limpiar_datasets():
+    """
+    Borra los archivos sin uso durante RETENCION_DATASETS y, si quedan más de
+    MAX_DATASETS, los menos usados recientemente.
+    """
+    try:
+        nombres = os.listdir(DIRECTORIO_DATASETS)
+    except FileNotFoundError:
+        return
+    archivos = []
+    for nombre in nombres:
+        ruta = os.path.join(DIRECTORIO_DATASETS, nombre)
+        try:
+            archivos.append((os.path.getmtime(ruta), ruta))
+        except OSError:
+            continue
+    archivos.sort(reverse=True)
+    limite = time.time() - RETENCION_DATASETS
+    for posicion, (modificado, ruta) in enumerate(archivos):
+        if modificado < limite or posicion >= MAX_DATASETS:
+            try:
+                os.remove(ruta)
+            except OSError:
+                pass
+
+def ruta_dataset(hash_dataset: str) -> str:
+    return os.path.join(DIRECTORIO_DATASETS, f"{hash_dataset}.xlsx")
+
+def registrar_dataset(contenido: bytes) -> str:
+    """
+    Guarda el archivo en el directorio de datasets y devuelve su hash.
+    """
+    hash_dataset = hashlib.sha256(contenido).hexdigest()[:20]
+    ruta = ruta_dataset(hash_dataset)
+    if os.path.exists(ruta):
+        os.utime(ruta)
+    else:
+        limpiar_datasets()
+        os.makedirs(DIRECTORIO_DATASETS, mode=0o700, exist_ok=True)
+        temporal = f"{ruta}.{os.getpid()}.tmp"
+        descriptor = os.open(temporal, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(descriptor, "wb") as archivo:
+            archivo.write(contenido)
+        os.replace(temporal, ruta)
+    return hash_dataset
+
+def obtener_hash_dataset(uploaded_file, parametro: str):
+    """
+    Devuelve el hash del dataset de la pestaña: el del archivo subido o, si no
+    hay archivo, el del enlace compartido (parámetro de la URL).
+
+    Args:
+        uploaded_file: Archivo del st.file_uploader (o None)
+        parametro (str): Nombre del parámetro de la URL con el hash del dataset
+
+    Returns:
+        str | None: Hash del dataset disponible, o None si no hay datos
+    """
+    subido = f"_subido_{parametro}"
     if uploaded_file is not None:
-        return pd.read_excel(uploaded_file, engine='openpyxl')
+        hash_dataset = registrar_dataset(uploaded_file.getvalue())
+        st.query_params[parametro] = hash_dataset
+        st.session_state[subido] = True
+        return hash_dataset
+
+    # El usuario quitó el archivo que había subido: se quita también de la URL
+    if st.session_state.get(subido):
+        st.session_state[subido] = False
+        if parametro in st.query_params:
+            del st.query_params[parametro]
+        return None
+
+    hash_dataset = st.query_params.get(parametro)
+    if hash_dataset and hash_dataset.isalnum():
+        ruta = ruta_dataset(hash_dataset)
+        if os.path.exists(ruta) and os.path.getmtime(ruta) >= time.time() - RETENCION_DATASETS:
+            # Un enlace en uso mantiene vigente el dataset
+            os.utime(ruta)
+            return hash_dataset
     return None
 
+@st.cache_data(show_spinner="Cargando datos...", max_entries=MAX_DATASETS_EN_MEMORIA, ttl=RETENCION_DATASETS)
+def load_data(hash_dataset: str, columnas_fecha: tuple = ()):
+    """
+    Lee el Excel registrado con ese hash y convierte las columnas de fecha.
+    El resultado queda en caché por hash, compartido entre sesiones.
+    """
+    ruta = ruta_dataset(hash_dataset)
+    if not os.path.exists(ruta):
+        return None
+    df = pd.read_excel(ruta, engine='openpyxl')
+    for columna in columnas_fecha:
+        df[columna] = pd.to_datetime(df[columna], errors='coerce')
+    return df
+
+# Resultados de cada vista (gráficos en PNG, métricas y agregados) compartidos
+# entre sesiones, con clave (pestaña, hash del dataset, filtros, elemento)
+MAX_RESULTADOS_VISTA = 1000
+# Resolución con la que los gráficos más anchos (12") no superan el ancho máximo
+# de Streamlit, así st.image sirve el PNG en caché sin redimensionarlo
+DPI_GRAFICOS = 120
+
+@st.cache_resource
+def _cache_vistas():
+    return threading.Lock(), OrderedDict()
+
+def resultado_vista(clave: tuple, calcular):
+    """
+    Devuelve el resultado en caché para la clave o lo calcula con calcular()
+    y lo guarda. Otra sesión con la misma vista (p. ej. un enlace compartido)
+    lo reutiliza sin recalcular. Los resultados no deben modificarse.
+    """
+    if clave is None:
+        return calcular()
+
+    candado, resultados = _cache_vistas()
+    with candado:
+        if clave in resultados:
+            resultados.move_to_end(clave)
+            return resultados[clave]
+    resultado = calcular()
+    with candado:
+        resultados[clave] = resultado
+        while len(resultados) > MAX_RESULTADOS_VISTA:
+            resultados.popitem(last=False)
+    return resultado
+
+def mostrar_figura(clave: tuple, construir):
+    """
+    Muestra un gráfico desde la caché de vistas. construir() arma y devuelve
+    la figura de matplotlib, y solo se llama si el PNG no está en caché.
+    """
+    def renderizar():
+        fig = construir()
+        buffer = io.BytesIO()
+        fig.savefig(buffer, format="png", dpi=DPI_GRAFICOS, bbox_inches="tight")
+        plt.close(fig)
+        return buffer.getvalue()
+
+    st.image(resultado_vista(clave, renderizar), use_container_width=True)
+
+def filtros_desde_url() -> dict:
+    """
+    Filtros recibidos en la URL al abrir la sesión. Se leen una sola vez para
+    que los valores por defecto de los widgets no cambien entre reruns.
+    """
+    if '_filtros_url' not in st.session_state:
+        st.session_state._filtros_url = {
+            clave: st.query_params[clave] for clave in FILTROS_URL if clave in st.query_params
+        }
+    return st.session_state._filtros_url
+
+def indice_url(clave: str, opciones: list) -> int:
+    """
+    Índice de la opción indicada en la URL para un selectbox (0 si no aplica).
+    """
+    valor = filtros_desde_url().get(clave)
+    for indice, opcion in enumerate(opciones):
+        if str(opcion) == valor:
+            return indice
+    return 0
+
+def valor_url(clave: str, por_defecto: int, minimo: int, maximo: int) -> int:
+    """
+    Valor entero indicado en la URL para un slider, limitado a su rango, o el
+    valor por defecto.
+    """
+    try:
+        valor = int(filtros_desde_url()[clave])
+    except (KeyError, ValueError):
+        return por_defecto
+    return min(max(valor, minimo), maximo)
+
+def sincronizar_url():
+    """
+    Copia los filtros actuales a la URL y muestra el enlace para compartir la vista.
+    """
+    for clave in FILTROS_URL:
+        if clave in st.session_state:
+            st.query_params[clave] = str(st.session_state[clave])
+
+    with st.sidebar:
+        if any(parametro in st.query_params for parametro in ("ds_vida", "ds_hogar", "ds_cuota")):
+            base_url = (st.context.url or "").split("?")[0]
+            enlace = f"{base_url}?{urlencode(st.query_params.to_dict())}"
+            st.caption("🔗 Enlace para compartir esta vista")
+            st.code(enlace, language=None)
+
+# Grupos de edad para la distribución de edades
+BINS_EDAD = [0, 20, 25, 30, 35, 40, 45, 50, 55, 60, 65, 70, 75, 80, 85, 120]
+ETIQUETAS_EDAD = [
+    '0-20', '20-25', '25-30', '30-35', '35-40', 
+    '40-45', '45-50', '50-55', '55-60', '60-65',
+    '65-70', '70-75', '75-80', '80-85', '85+'
+]
+
+def distribuir_edades(edades: pd.Series) -> pd.Series:
+    """
+    Cantidad de casos por grupo de edad, en el orden de los grupos.
+    """
+    grupos = pd.cut(edades, bins=BINS_EDAD, labels=ETIQUETAS_EDAD, right=False).rename('GRUPO_EDAD')
+    return grupos.value_counts().sort_index()
+
+# Grupos de pares para el puntaje de reclamos atípicos, del más fino al más
+# grueso: si el grupo de un reclamo es muy chico se usa el siguiente nivel
+COLUMNAS_PARES = ['BASE', 'CAUSA SINIESTRO', 'AGENCIA']
+MIN_GRUPO_PARES = 5
+LIMITE_ATIPICOS = 50
+
+def _z_robusta(valores: pd.Series, grupos: np.ndarray) -> pd.Series:
+    """
+    Z-score robusto (mediana y MAD) de cada valor dentro de su grupo de pares.
+
+    Si el MAD es 0 (más de la mitad del grupo comparte un valor, p. ej. días
+    enteros) se usa la desviación absoluta media: 1.2533 * mean|x - mediana|.
+    """
+    mediana = valores.groupby(grupos).transform('median')
+    desviacion = valores - mediana
+    absoluta = desviacion.abs()
+    mad = absoluta.groupby(grupos).transform('median')
+    media_absoluta = absoluta.groupby(grupos).transform('mean')
+    z_mad = 0.6745 * desviacion / mad.replace(0, np.nan)
+    z_media = desviacion / (1.2533 * media_absoluta).replace(0, np.nan)
+    return z_mad.where(mad > 0, z_media)
+
+@st.cache_data(show_spinner="Calculando reclamos atípicos...", max_entries=MAX_RESULTADOS_EN_CACHE, ttl=RETENCION_DATASETS)
+def calcular_puntajes_anomalia(_df: pd.DataFrame, hash_dataset: str, tipo: str) -> pd.DataFrame:
+    """
+    Calcula z-scores robustos y percentiles de los reclamos liquidados dentro
+    de su grupo de pares (BASE × CAUSA SINIESTRO × AGENCIA). Si ese grupo tiene
+    menos de MIN_GRUPO_PARES reclamos se compara con BASE × CAUSA SINIESTRO y
+    luego con BASE; NIVEL_PARES indica el nivel usado.
+
+    Todas las operaciones son agrupadas y vectorizadas, por lo que el costo
+    crece linealmente con el número de reclamos. El resultado queda en caché
+    por hash del dataset.
+
+    Args:
+        _df (pd.DataFrame): Dataset completo con fechas ya procesadas
+        hash_dataset (str): Hash del dataset, usado como clave de caché
+        tipo (str): Pestaña ('vida', 'hogar' o 'cuota'); cada una procesa el archivo distinto
+
+    Returns:
+        pd.DataFrame: Reclamos liquidados con sus métricas y PUNTAJE_ATIPICO
+    """
+    liquidados = _df[_df['ESTADO'] == 'LIQUIDADO'].copy()
+    if liquidados.empty:
+        return liquidados
+
+    columnas_pares = [c for c in COLUMNAS_PARES if c in liquidados.columns]
+    for columna in columnas_pares:
+        liquidados[columna] = liquidados[columna].fillna('No especificado')
+
+    # Nivel de pares de cada reclamo: el más fino con al menos MIN_GRUPO_PARES (-1 si ninguno)
+    niveles = [columnas_pares[:n] for n in range(len(columnas_pares), 0, -1)] or [[]]
+    grupos_nivel, tamaños_nivel = [], []
+    nivel_usado = np.full(len(liquidados), -1)
+    for posicion, columnas in enumerate(niveles):
+        if columnas:
+            grupos = liquidados.groupby(columnas, sort=False).ngroup().to_numpy()
+        else:
+            grupos = np.zeros(len(liquidados), dtype=int)
+        tamaño = np.bincount(grupos)[grupos]
+        nivel_usado[(nivel_usado == -1) & (tamaño >= MIN_GRUPO_PARES)] = posicion
+        grupos_nivel.append(grupos)
+        tamaños_nivel.append(tamaño)
+
+    # Métricas a evaluar (solo las que el archivo permite calcular)
+    metricas = ['VALOR INDEMNIZADO']
+    if 'VALOR RECLAMADO' in liquidados.columns:
+        liquidados['RATIO_INDEMNIZACION'] = liquidados['VALOR INDEMNIZADO'] / liquidados['VALOR RECLAMADO'].replace(0, np.nan)
+        metricas.append('RATIO_INDEMNIZACION')
+    liquidados['TIEMPO_RESPUESTA'] = (liquidados['FECHA NOTIFICACION SINIESTRO'] - liquidados['FECHA SINIESTRO']).dt.days
+    metricas.append('TIEMPO_RESPUESTA')
+    if 'FECHA DE CIERRE/INDEMNIZACION' in liquidados.columns:
+        # Cuota Protegida no convierte esta columna al cargar: puede venir como texto
+        cierre = pd.to_datetime(liquidados['FECHA DE CIERRE/INDEMNIZACION'], errors='coerce')
+        liquidados['TIEMPO_CIERRE'] = (cierre - liquidados['FECHA NOTIFICACION SINIESTRO']).dt.days
+        metricas.append('TIEMPO_CIERRE')
+
+    # Sin grupo suficiente se informa el tamaño del grupo más fino
+    filas = np.arange(len(liquidados))
+    liquidados['TAMAÑO_GRUPO'] = np.stack(tamaños_nivel)[np.maximum(nivel_usado, 0), filas]
+    etiquetas = np.array([' × '.join(columnas) or 'Todos' for columnas in niveles] + ['Sin grupo suficiente'])
+    liquidados['NIVEL_PARES'] = etiquetas[np.where(nivel_usado >= 0, nivel_usado, len(niveles))]
+
+    columnas_z = []
+    for metrica in metricas:
+        valores = pd.to_numeric(liquidados[metrica], errors='coerce')
+        z = pd.Series(np.nan, index=liquidados.index)
+        pct = pd.Series(np.nan, index=liquidados.index)
+        for posicion, grupos in enumerate(grupos_nivel):
+            usar = nivel_usado == posicion
+            if usar.any():
+                # Los pares son todo el grupo del nivel, no solo los reclamos que lo usan
+                z = z.mask(usar, _z_robusta(valores, grupos))
+                pct = pct.mask(usar, valores.groupby(grupos).rank(pct=True))
+        liquidados[f'Z_{metrica}'] = z
+        liquidados[f'PCT_{metrica}'] = pct
+        columnas_z.append(f'Z_{metrica}')
+
+    liquidados['PUNTAJE_ATIPICO'] = liquidados[columnas_z].abs().max(axis=1).fillna(0)
+    return liquidados.sort_values('PUNTAJE_ATIPICO', ascending=False)
+
+def mostrar_atipicos(puntajes: pd.DataFrame, año=None, producto: str = 'Todas', titulo: str = "Reclamos Atípicos"):
+    """
+    Muestra los reclamos liquidados con mayor puntaje de anomalía.
+
+    Args:
+        puntajes (pd.DataFrame): Resultado de calcular_puntajes_anomalia
+        año: Año a mostrar, o None / 'Todos' para no filtrar
+        producto (str): Producto (BASE) a mostrar o 'Todas'
+        titulo (str): Título de la sección
+    """
+    st.header(f"🚨 {titulo}")
+    vista = puntajes
+    if año is not None and año != 'Todos' and not vista.empty:
+        vista = vista[vista['FECHA SINIESTRO'].dt.year == año]
+    if producto != 'Todas' and not vista.empty:
+        vista = vista[vista['BASE'] == producto]
+    vista = vista[vista['PUNTAJE_ATIPICO'] > 0] if not vista.empty else vista
+
+    if vista.empty:
+        st.info("No hay reclamos atípicos para los filtros seleccionados")
+        return
+
+    columnas = [c for c in ['FECHA SINIESTRO', 'BASE', 'CAUSA SINIESTRO', 'AGENCIA', 'ASESOR',
+                            'VALOR RECLAMADO', 'VALOR INDEMNIZADO', 'TIEMPO_RESPUESTA', 'TIEMPO_CIERRE',
+                            'NIVEL_PARES', 'TAMAÑO_GRUPO', 'PUNTAJE_ATIPICO'] if c in vista.columns]
+    columnas += [c for c in vista.columns if c.startswith(('Z_', 'PCT_'))]
+    st.caption(
+        f"Top {LIMITE_ATIPICOS} reclamos liquidados según z-score robusto dentro de su grupo "
+        f"(BASE × CAUSA SINIESTRO × AGENCIA; si tiene menos de {MIN_GRUPO_PARES} reclamos, "
+        f"BASE × CAUSA SINIESTRO o BASE, según NIVEL_PARES)"
+    )
+    st.dataframe(vista[columnas].head(LIMITE_ATIPICOS), use_container_width=True)
+
+# Estados que cuentan como reclamos abiertos (backlog)
+ESTADOS_ABIERTOS = ['EN PROCESO', 'PENDIENTE', 'PENDIENTE DOCUMENTOS']
+
+@st.cache_data(show_spinner=False, max_entries=MAX_RESULTADOS_EN_CACHE, ttl=RETENCION_DATASETS)
+def calcular_scorecards(_df: pd.DataFrame, columna: str, clave_resultado: tuple) -> pd.DataFrame:
+    """
+    Calcula el scorecard por agencia o asesor en una sola pasada de groupby.
+
+    Args:
+        _df (pd.DataFrame): Reclamos (todos los estados) con fechas ya procesadas
+        columna (str): Columna de agrupación ('AGENCIA' o 'ASESOR')
+        clave_resultado (tuple): Pestaña, hash del dataset y filtros aplicados, usado como clave de caché
+
+    Returns:
+        pd.DataFrame: Una fila por agencia/asesor con las métricas agregadas
+    """
+    liquidado = _df['ESTADO'] == 'LIQUIDADO'
+    base = pd.DataFrame({
+        columna: _df[columna].fillna('No especificado'),
+        'LIQUIDADO': liquidado,
+        'NEGADO': _df['ESTADO'] == 'NEGADO',
+        'ABIERTO': _df['ESTADO'].isin(ESTADOS_ABIERTOS),
+        'INDEMNIZADO': _df['VALOR INDEMNIZADO'].where(liquidado),
+        'NOTIFICACION': (_df['FECHA NOTIFICACION SINIESTRO'] - _df['FECHA SINIESTRO']).dt.days.where(liquidado),
+    })
+    if 'FECHA DE CIERRE/INDEMNIZACION' in _df.columns:
+        # Cuota Protegida no convierte esta columna al cargar: puede venir como texto
+        cierre = pd.to_datetime(_df['FECHA DE CIERRE/INDEMNIZACION'], errors='coerce')
+        base['CIERRE'] = (cierre - _df['FECHA NOTIFICACION SINIESTRO']).dt.days.where(liquidado)
+    else:
+        base['CIERRE'] = np.nan
+
+    scorecard = base.groupby(columna, sort=False).agg(
+        Reclamos=('LIQUIDADO', 'size'),
+        Liquidados=('LIQUIDADO', 'sum'),
+        Negados=('NEGADO', 'sum'),
+        Backlog=('ABIERTO', 'sum'),
+        Total_Indemnizado=('INDEMNIZADO', 'sum'),
+        Mediana_Notificacion=('NOTIFICACION', 'median'),
+        Mediana_Cierre=('CIERRE', 'median'),
+    )
+    decididos = scorecard['Liquidados'] + scorecard['Negados']
+    scorecard['Ratio_Aprobacion'] = scorecard['Liquidados'] / decididos.replace(0, np.nan)
+    return scorecard.reset_index().sort_values('Reclamos', ascending=False, ignore_index=True)
+
+def mostrar_scorecards(df: pd.DataFrame, columna: str, clave: str, titulo: str, clave_resultado: tuple):
+    """
+    Muestra el scorecard precalculado con filtros que no recalculan sobre los reclamos.
+
+    Args:
+        df (pd.DataFrame): Reclamos filtrados (todos los estados)
+        columna (str): Columna de agrupación ('AGENCIA' o 'ASESOR')
+        clave (str): Prefijo único para las claves de los widgets
+        titulo (str): Título de la sección
+        clave_resultado (tuple): Pestaña, hash del dataset y filtros aplicados
+    """
+    scorecard = calcular_scorecards(df, columna, clave_resultado)
+    st.subheader(titulo)
+    _tabla_scorecard(scorecard, columna, clave)
+
+@st.fragment
+def _tabla_scorecard(scorecard: pd.DataFrame, columna: str, clave: str):
+    """
+    Filtros y tabla del scorecard. Como fragmento, buscar o cambiar el mínimo
+    solo vuelve a ejecutar esta parte y no todo el dashboard.
+    """
+    col_f1, col_f2 = st.columns(2)
+    with col_f1:
+        busqueda = st.text_input(f"Buscar {columna.lower()}", key=f"buscar_{clave}")
+    with col_f2:
+        min_reclamos = st.number_input("Mínimo de reclamos", min_value=0, value=0, step=1, key=f"min_{clave}")
+
+    vista = scorecard[scorecard['Reclamos'] >= min_reclamos]
+    if busqueda:
+        vista = vista[vista[columna].astype(str).str.contains(busqueda, case=False, regex=False)]
+
+    st.dataframe(
+        vista,
+        use_container_width=True,
+        hide_index=True,
+        column_config={
+            'Total_Indemnizado': st.column_config.NumberColumn("Total Indemnizado", format="$%.2f"),
+            'Ratio_Aprobacion': st.column_config.NumberColumn("Ratio Aprobación", format="%.2f"),
+            'Mediana_Notificacion': st.column_config.NumberColumn("Mediana Notificación (días)", format="%.1f"),
+            'Mediana_Cierre': st.column_config.NumberColumn("Mediana Cierre (días)", format="%.1f"),
+        }
+    )
+
 # ==============================================
 # Configuración de la aplicación principal
 # ==============================================
@@ -88,9 +626,17 @@ def load_data(uploaded_file):
 # Configuración de página
 st.set_page_config(page_title="Análisis de Reclamos", layout="wide")
 
+# Guardar el token de sesión en el navegador tras iniciar sesión
+if st.session_state.pop('_cookie_pendiente', False):
+    escribir_cookie_sesion(st.session_state.token_sesion)
+
 # Botón de logout en sidebar
 with st.sidebar:
     if st.button("🚪 Cerrar Sesión"):
+        if st.session_state.get('token_sesion'):
+            servicios_autenticacion()[1].revocar(st.session_state.pop('token_sesion'))
+        st.session_state._borrar_cookie = True
+        st.session_state._cerro_sesion = True
         st.session_state.autenticado = False
         st.rerun()
 
@@ -107,19 +653,14 @@ with tab1:
     st.header("Análisis de Reclamos de Vida - Desgravamen")
     uploaded_file_vida = st.file_uploader("Sube tu archivo Excel - Reclamos de Vida/Desgravamen", type=["xlsx", "xls"], key="vida")
 
-    if uploaded_file_vida:
-        df = load_data(uploaded_file_vida)
+    hash_vida = obtener_hash_dataset(uploaded_file_vida, "ds_vida")
+
+    if hash_vida:
+        df = load_data(hash_vida, FECHAS_VIDA)
         
         if df is not None:
             st.success("Datos cargados correctamente ✅")
             
-            # Procesar fechas
-            df['FECHA SINIESTRO'] = pd.to_datetime(df['FECHA SINIESTRO'], errors='coerce')
-            df['FECHA NOTIFICACION SINIESTRO'] = pd.to_datetime(df['FECHA NOTIFICACION SINIESTRO'], errors='coerce')
-            df['FECHA DE CIERRE/INDEMNIZACION'] = pd.to_datetime(df['FECHA DE CIERRE/INDEMNIZACION'], errors='coerce')
-            df['INICIO VIGENCIA'] = pd.to_datetime(df['INICIO VIGENCIA'], errors='coerce')
-            df['FIN VIGENCIA'] = pd.to_datetime(df['FIN VIGENCIA'], errors='coerce')
-            
             # Verificar si tiene columna EDAD (para bases antiguas) o calcularla
             if 'EDAD' not in df.columns:
                 st.info("ℹ️ Este archivo no contiene columna EDAD. Algunas métricas de edad no estarán disponibles.")
@@ -137,15 +678,16 @@ with tab1:
             # Sidebar controls
             with st.sidebar:
                 st.header("⚙️ Configuración - Vida")
-                año_analisis = st.selectbox("Seleccionar Año", sorted(df['FECHA SINIESTRO'].dt.year.unique()), key="año_vida")
-                top_n = st.slider("Top N Causas", 3, 10, 5, key="top_vida")
-                bins_hist = st.slider("Bins para Histograma", 10, 100, 30, key="bins_vida")
+                años_vida = sorted(df['FECHA SINIESTRO'].dt.year.unique())
+                año_analisis = st.selectbox("Seleccionar Año", años_vida, index=indice_url("año_vida", años_vida), key="año_vida")
+                top_n = st.slider("Top N Causas", 3, 10, valor_url("top_vida", 5, 3, 10), key="top_vida")
+                bins_hist = st.slider("Bins para Histograma", 10, 100, valor_url("bins_vida", 30, 10, 100), key="bins_vida")
                 
                 # Filtros principales
                 df['BASE'] = df['BASE'].fillna('No especificado').str.upper()
                 base_values = df['BASE'].copy()
                 producto = ['Todas'] + sorted(base_values.unique().tolist())
-                producto_sel = st.selectbox("Seleccionar Producto", producto, key="prod_vida")
+                producto_sel = st.selectbox("Seleccionar Producto", producto, index=indice_url("prod_vida", producto), key="prod_vida")
                 df_filtrado = df.copy()
                 if producto_sel != 'Todas':
                     df = df_filtrado[df_filtrado['BASE'] == producto_sel]
@@ -161,110 +703,113 @@ with tab1:
             negados_filtrados = negados[negados['FECHA SINIESTRO'].dt.year == año_analisis]
             procesados_filtrados = procesados[procesados['FECHA SINIESTRO'].dt.year == año_analisis]
             df2 = df[df['FECHA SINIESTRO'].dt.year == año_analisis]
+            clave_vista_vida = ('vida', hash_vida, año_analisis, producto_sel)
             
             # Análisis temporal
             st.header("📈 Reclamos Liquidados")
 
             if not liquidados_filtrados.empty:
                 # Gráfico de reclamos por mes
-                fig, ax = plt.subplots(figsize=(10, 4))
-                liquidados_filtrados['MES'] = liquidados_filtrados['FECHA SINIESTRO'].dt.month
-                liquidados_filtrados['MES'] = pd.Categorical(liquidados_filtrados['MES'], ordered=True)
-                liquidados_filtrados['MES'].value_counts().sort_index().plot(kind='bar', color='teal', ax=ax)
-                plt.title('Reclamos Liquidados por Mes')
-                plt.xlabel('Mes')
-                plt.ylabel('Cantidad de Reclamos')
-                st.pyplot(fig)
+                def grafico_mes():
+                    fig, ax = plt.subplots(figsize=(10, 4))
+                    meses = pd.Categorical(liquidados_filtrados['FECHA SINIESTRO'].dt.month, ordered=True)
+                    pd.Series(meses).value_counts().sort_index().plot(kind='bar', color='teal', ax=ax)
+                    plt.title('Reclamos Liquidados por Mes')
+                    plt.xlabel('Mes')
+                    plt.ylabel('Cantidad de Reclamos')
+                    return fig
+                mostrar_figura(clave_vista_vida + ('mes',), grafico_mes)
                 
                 # Métricas resumen
                 col1, col2 = st.columns(2)
-                liquidados_filtrados['TIEMPO_RESPUESTA'] = (liquidados_filtrados['FECHA NOTIFICACION SINIESTRO'] - liquidados_filtrados['FECHA SINIESTRO']).dt.days
-                liquidados_filtrados['TIEMPO_CIERRE'] = (liquidados_filtrados['FECHA DE CIERRE/INDEMNIZACION'] - liquidados_filtrados['FECHA NOTIFICACION SINIESTRO']).dt.days
-                tiempo_promedio = liquidados_filtrados['TIEMPO_RESPUESTA'].mean()
+                kpis = resultado_vista(clave_vista_vida + ('kpis',), lambda: {
+                    'total': len(liquidados_filtrados),
+                    'tiempo_promedio': (liquidados_filtrados['FECHA NOTIFICACION SINIESTRO'] - liquidados_filtrados['FECHA SINIESTRO']).dt.days.mean(),
+                    'indemnizado': liquidados_filtrados['VALOR INDEMNIZADO'].sum(),
+                    'edad': df['EDAD'].mean() if tiene_edad else None,
+                    'plazo': None if tiene_edad else liquidados_filtrados['PLAZO'].mean(),
+                })
                 
                 with col1:
-                    st.metric("Total Reclamos Liquidados", f"{len(liquidados_filtrados):,}")
+                    st.metric("Total Reclamos Liquidados", f"{kpis['total']:,}")
                     st.metric(
                         label="Días promedio entre siniestro y notificación",
-                        value=f"{tiempo_promedio:.1f} días",
+                        value=f"{kpis['tiempo_promedio']:.1f} días",
                         help="Tiempo promedio desde que ocurre el siniestro hasta su notificación"
                     )
                 with col2:
-                    st.metric("Valor Total Indemnizado", f"${liquidados_filtrados['VALOR INDEMNIZADO'].sum():,.2f}")
+                    st.metric("Valor Total Indemnizado", f"${kpis['indemnizado']:,.2f}")
                     if tiene_edad:
-                        st.metric("Edad Promedio", f"{df['EDAD'].mean():.1f} años")
+                        st.metric("Edad Promedio", f"{kpis['edad']:.1f} años")
                     else:
-                        st.metric("Plazo Promedio Crédito", f"{liquidados_filtrados['PLAZO'].mean():.1f} meses")
+                        st.metric("Plazo Promedio Crédito", f"{kpis['plazo']:.1f} meses")
                 
                 # Análisis de valores
                 st.header("💰 Análisis de Valores Asegurados")
                 
-                fig = plt.figure(figsize=(10, 5))
-                sns.histplot(liquidados_filtrados['VALOR INDEMNIZADO'], bins=bins_hist, kde=True, color='purple')
-                plt.title('Distribución de Valores Asegurados')
-                st.pyplot(fig)
+                def grafico_valores():
+                    fig = plt.figure(figsize=(10, 5))
+                    sns.histplot(liquidados_filtrados['VALOR INDEMNIZADO'], bins=bins_hist, kde=True, color='purple')
+                    plt.title('Distribución de Valores Asegurados')
+                    return fig
+                mostrar_figura(clave_vista_vida + ('valores', bins_hist), grafico_valores)
                 
                 # Análisis de causas
                 st.header("🩺 Análisis de Causas de Siniestros")
                 
-                top_causas = liquidados_filtrados['CAUSA SINIESTRO'].value_counts().nlargest(top_n)
-                fig, ax = plt.subplots(figsize=(10, 5))
-                sns.barplot(x=top_causas.values, y=top_causas.index, palette='viridis')
-                plt.title(f'Top {top_n} Causas de Siniestros')
-                plt.xlabel('Cantidad de Reclamos')
-                st.pyplot(fig)
+                def grafico_causas():
+                    top_causas = liquidados_filtrados['CAUSA SINIESTRO'].value_counts().nlargest(top_n)
+                    fig, ax = plt.subplots(figsize=(10, 5))
+                    sns.barplot(x=top_causas.values, y=top_causas.index, palette='viridis')
+                    plt.title(f'Top {top_n} Causas de Siniestros')
+                    plt.xlabel('Cantidad de Reclamos')
+                    return fig
+                mostrar_figura(clave_vista_vida + ('causas', top_n), grafico_causas)
                 
                 # Análisis de parentesco (solo si existe la columna)
                 if tiene_parentesco:
                     st.header("👪 Distribución por Parentesco")
-                    fig, ax = plt.subplots(figsize=(8, 6))
-                    sns.countplot(y='PARENTESCO', data=liquidados_filtrados, order=liquidados_filtrados['PARENTESCO'].value_counts().index)
-                    plt.title('Distribución de Reclamos por Parentesco')
-                    st.pyplot(fig)
+                    def grafico_parentesco():
+                        fig, ax = plt.subplots(figsize=(8, 6))
+                        sns.countplot(y='PARENTESCO', data=liquidados_filtrados, order=liquidados_filtrados['PARENTESCO'].value_counts().index)
+                        plt.title('Distribución de Reclamos por Parentesco')
+                        return fig
+                    mostrar_figura(clave_vista_vida + ('parentesco',), grafico_parentesco)
         
                 # Distribución de Edades (solo si existe la columna)
                 if tiene_edad:
                     st.subheader("👥 Distribución de Edades")
-                            
-                    bins = [0, 20, 25, 30, 35, 40, 45, 50, 55, 60, 65, 70, 75, 80, 85, 120]
-                    labels = [
-                        '0-20', '20-25', '25-30', '30-35', '35-40', 
-                        '40-45', '45-50', '50-55', '55-60', '60-65',
-                        '65-70', '70-75', '75-80', '80-85', '85+'
-                    ]
-                    
-                    liquidados_filtrados['GRUPO_EDAD'] = pd.cut(
-                        liquidados_filtrados['EDAD'],
-                        bins=bins,
-                        labels=labels,
-                        right=False
-                    )
                     
-                    distribucion_edades = liquidados_filtrados['GRUPO_EDAD'].value_counts().sort_index()
-                    
-                    fig, ax = plt.subplots(figsize=(12, 6))
-                    sns.barplot(
-                        x=distribucion_edades.index,
-                        y=distribucion_edades.values,
-                        palette="viridis",
-                        ax=ax
+                    distribucion_edades = resultado_vista(
+                        clave_vista_vida + ('distribucion_edades',),
+                        lambda: distribuir_edades(liquidados_filtrados['EDAD'])
                     )
                     
-                    plt.title('Distribución de Edades por Grupo', fontsize=14)
-                    plt.xlabel('Grupo de Edad', fontsize=12)
-                    plt.ylabel('Cantidad de Casos', fontsize=12)
-                    plt.xticks(rotation=45)
-                    
-                    for p in ax.patches:
-                        ax.annotate(
-                            f'{int(p.get_height())}', 
-                            (p.get_x() + p.get_width() / 2., p.get_height()),
-                            ha='center', va='center', 
-                            xytext=(0, 5), 
-                            textcoords='offset points'
+                    def grafico_edades():
+                        fig, ax = plt.subplots(figsize=(12, 6))
+                        sns.barplot(
+                            x=distribucion_edades.index,
+                            y=distribucion_edades.values,
+                            palette="viridis",
+                            ax=ax
                         )
+                        
+                        plt.title('Distribución de Edades por Grupo', fontsize=14)
+                        plt.xlabel('Grupo de Edad', fontsize=12)
+                        plt.ylabel('Cantidad de Casos', fontsize=12)
+                        plt.xticks(rotation=45)
+                        
+                        for p in ax.patches:
+                            ax.annotate(
+                                f'{int(p.get_height())}', 
+                                (p.get_x() + p.get_width() / 2., p.get_height()),
+                                ha='center', va='center', 
+                                xytext=(0, 5), 
+                                textcoords='offset points'
+                            )
+                        return fig
                     
-                    st.pyplot(fig)
+                    mostrar_figura(clave_vista_vida + ('edades',), grafico_edades)
                     
                     with st.expander("📊 Ver datos detallados por grupo de edad"):
                         st.dataframe(
@@ -279,39 +824,57 @@ with tab1:
                     st.subheader("📍 Análisis de Agencias y Personal")
                     
                     if tiene_agencia:
-                        distribucion_agencias = liquidados_filtrados['AGENCIA'].value_counts().sort_index()
-                        fig, ax = plt.subplots(figsize=(12, 6))
-                        sns.barplot(
-                                x=distribucion_agencias.index,
-                                y=distribucion_agencias.values,
-                                palette="viridis",
-                                ax=ax
-                            )
-                            
-                        plt.title('Reclamos por Agencias', fontsize=14)
-                        plt.xlabel('Agencia', fontsize=12)
-                        plt.ylabel('Cantidad de Casos', fontsize=12)
-                        plt.xticks(rotation=45)
-                        st.pyplot(fig)
+                        def grafico_agencias():
+                            distribucion_agencias = liquidados_filtrados['AGENCIA'].value_counts().sort_index()
+                            fig, ax = plt.subplots(figsize=(12, 6))
+                            sns.barplot(
+                                    x=distribucion_agencias.index,
+                                    y=distribucion_agencias.values,
+                                    palette="viridis",
+                                    ax=ax
+                                )
+                                
+                            plt.title('Reclamos por Agencias', fontsize=14)
+                            plt.xlabel('Agencia', fontsize=12)
+                            plt.ylabel('Cantidad de Casos', fontsize=12)
+                            plt.xticks(rotation=45)
+                            return fig
+                        mostrar_figura(clave_vista_vida + ('agencias',), grafico_agencias)
 
                     if tiene_asesor:
-                        distribucion_asesores = liquidados_filtrados['ASESOR'].value_counts().sort_index()
-                        fig, ax = plt.subplots(figsize=(12, 6))
-                        sns.barplot(
-                                x=distribucion_asesores.index,
-                                y=distribucion_asesores.values,
-                                palette="viridis",
-                                ax=ax
-                            )
-                        plt.title('Reclamos por Asesor', fontsize=14)
-                        plt.xlabel('Asesor', fontsize=12)
-                        plt.ylabel('Cantidad de Casos', fontsize=12)
-                        plt.xticks(rotation=45)
-                        st.pyplot(fig)
+                        def grafico_asesores():
+                            distribucion_asesores = liquidados_filtrados['ASESOR'].value_counts().sort_index()
+                            fig, ax = plt.subplots(figsize=(12, 6))
+                            sns.barplot(
+                                    x=distribucion_asesores.index,
+                                    y=distribucion_asesores.values,
+                                    palette="viridis",
+                                    ax=ax
+                                )
+                            plt.title('Reclamos por Asesor', fontsize=14)
+                            plt.xlabel('Asesor', fontsize=12)
+                            plt.ylabel('Cantidad de Casos', fontsize=12)
+                            plt.xticks(rotation=45)
+                            return fig
+                        mostrar_figura(clave_vista_vida + ('asesores',), grafico_asesores)
 
             else:
                 st.info("No hay reclamos liquidados para el año seleccionado")
 
+            # Scorecards (todos los estados del año y producto, haya o no liquidados)
+            if (tiene_agencia or tiene_asesor) and not df2.empty:
+                st.header("🏢 Scorecards de Agencias y Asesores")
+                if tiene_agencia:
+                    mostrar_scorecards(df2, 'AGENCIA', clave="agencia_vida", titulo="🏢 Scorecard por Agencia",
+                                       clave_resultado=clave_vista_vida)
+                if tiene_asesor:
+                    mostrar_scorecards(df2, 'ASESOR', clave="asesor_vida", titulo="🧑‍💼 Scorecard por Asesor",
+                                       clave_resultado=clave_vista_vida)
+
+            # Reclamos atípicos (puntaje calculado una vez sobre todo el dataset)
+            puntajes_vida = calcular_puntajes_anomalia(df_filtrado, hash_vida, 'vida')
+            mostrar_atipicos(puntajes_vida, año=año_analisis, producto=producto_sel)
+
             # Análisis de pendientes
             st.header("⏳ Reclamos Pendientes")
             
@@ -319,22 +882,26 @@ with tab1:
                 col6, col7 = st.columns(2)
                 
                 with col6:
-                    fig = plt.figure(figsize=(10, 5))
-                    sns.countplot(y='CAUSA SINIESTRO', data=pendientes_filtrados)
-                    plt.title('Causas de Reclamos Pendientes')
-                    st.pyplot(fig)
+                    def grafico_pendientes_causas():
+                        fig = plt.figure(figsize=(10, 5))
+                        sns.countplot(y='CAUSA SINIESTRO', data=pendientes_filtrados)
+                        plt.title('Causas de Reclamos Pendientes')
+                        return fig
+                    mostrar_figura(clave_vista_vida + ('pendientes_causas',), grafico_pendientes_causas)
                 
                 with col7:
-                    pendientes_filtrados['DIAS PENDIENTES'] = (datetime.now() - pendientes_filtrados['FECHA SINIESTRO']).dt.days
-                    fig = plt.figure(figsize=(10, 5))
-                    sns.histplot(pendientes_filtrados['DIAS PENDIENTES'], bins=20, kde=True)
-                    plt.title('Distribución de Días Pendientes')
-                    st.pyplot(fig)
+                    def grafico_pendientes_dias():
+                        dias_pendientes = (datetime.now() - pendientes_filtrados['FECHA SINIESTRO']).dt.days.rename('DIAS PENDIENTES')
+                        fig = plt.figure(figsize=(10, 5))
+                        sns.histplot(dias_pendientes, bins=20, kde=True)
+                        plt.title('Distribución de Días Pendientes')
+                        return fig
+                    mostrar_figura(clave_vista_vida + ('pendientes_dias', datetime.now().date()), grafico_pendientes_dias)
             else:
                 st.info("No hay reclamos con estado 'PENDIENTE DOCUMENTOS' para el año seleccionado")
 
-            visualizar_estadisticas_pendientes(negados_filtrados, titulo="Reclamos Negados")
-            visualizar_estadisticas_pendientes(procesados_filtrados, titulo="Reclamos Procesados")
+            visualizar_estadisticas_pendientes(negados_filtrados, titulo="Reclamos Negados", clave_vista=clave_vista_vida)
+            visualizar_estadisticas_pendientes(procesados_filtrados, titulo="Reclamos Procesados", clave_vista=clave_vista_vida)
 
             # Mostrar datos crudos
             st.header("📄 Datos Crudos")
@@ -352,19 +919,14 @@ with tab2:
     st.header("Análisis de Reclamos de Hogar/Propiedad")
     uploaded_file_hogar = st.file_uploader("Sube tu archivo Excel - Reclamos de Hogar", type=["xlsx", "xls"], key="hogar")
 
-    if uploaded_file_hogar:
-        df_hogar = load_data(uploaded_file_hogar)
+    hash_hogar = obtener_hash_dataset(uploaded_file_hogar, "ds_hogar")
+
+    if hash_hogar:
+        df_hogar = load_data(hash_hogar, FECHAS_HOGAR)
         
         if df_hogar is not None:
             st.success("Datos de hogar cargados correctamente ✅")
             
-            # Procesar fechas
-            df_hogar['FECHA SINIESTRO'] = pd.to_datetime(df_hogar['FECHA SINIESTRO'], errors='coerce')
-            df_hogar['FECHA NOTIFICACION SINIESTRO'] = pd.to_datetime(df_hogar['FECHA NOTIFICACION SINIESTRO'], errors='coerce')
-            df_hogar['FECHA DE CIERRE/INDEMNIZACION'] = pd.to_datetime(df_hogar['FECHA DE CIERRE/INDEMNIZACION'], errors='coerce')
-            df_hogar['INICIO VIGENCIA'] = pd.to_datetime(df_hogar['INICIO VIGENCIA'], errors='coerce')
-            df_hogar['FIN VIGENCIA'] = pd.to_datetime(df_hogar['FIN VIGENCIA'], errors='coerce')
-            
             # Sidebar controls
             with st.sidebar:
                 st.header("⚙️ Configuración - Hogar")
@@ -372,15 +934,15 @@ with tab2:
                 # Filtro de año con opción "Todos"
                 años_disponibles = sorted(df_hogar['FECHA SINIESTRO'].dt.year.unique())
                 años_opciones = ['Todos'] + años_disponibles
-                año_analisis_hogar = st.selectbox("Seleccionar Año", años_opciones, key="año_hogar")
+                año_analisis_hogar = st.selectbox("Seleccionar Año", años_opciones, index=indice_url("año_hogar", años_opciones), key="año_hogar")
                 
-                top_n_hogar = st.slider("Top N Causas", 3, 10, 5, key="top_hogar")
-                bins_hist_hogar = st.slider("Bins para Histograma", 10, 100, 30, key="bins_hogar")
+                top_n_hogar = st.slider("Top N Causas", 3, 10, valor_url("top_hogar", 5, 3, 10), key="top_hogar")
+                bins_hist_hogar = st.slider("Bins para Histograma", 10, 100, valor_url("bins_hogar", 30, 10, 100), key="bins_hogar")
                 
                 # Filtro por producto
                 df_hogar['BASE'] = df_hogar['BASE'].fillna('No especificado').str.upper()
                 productos_hogar = ['Todas'] + sorted(df_hogar['BASE'].unique().tolist())
-                producto_sel_hogar = st.selectbox("Seleccionar Producto", productos_hogar, key="prod_hogar")
+                producto_sel_hogar = st.selectbox("Seleccionar Producto", productos_hogar, index=indice_url("prod_hogar", productos_hogar), key="prod_hogar")
             
             # Aplicar filtros
             df_hogar_filtrado = df_hogar.copy()
@@ -393,6 +955,8 @@ with tab2:
             if producto_sel_hogar != 'Todas':
                 df_hogar_filtrado = df_hogar_filtrado[df_hogar_filtrado['BASE'] == producto_sel_hogar]
             
+            clave_vista_hogar = ('hogar', hash_hogar, año_analisis_hogar, producto_sel_hogar)
+            
             # Separar por estado (usando datos ya filtrados)
             liquidados_hogar_f = df_hogar_filtrado[df_hogar_filtrado['ESTADO'] == 'LIQUIDADO']
             negados_hogar_f = df_hogar_filtrado[df_hogar_filtrado['ESTADO'] == 'NEGADO']
@@ -404,64 +968,78 @@ with tab2:
             
             if not liquidados_hogar_f.empty:
                 # Gráfico temporal
-                fig, ax = plt.subplots(figsize=(10, 4))
-                liquidados_hogar_f['MES'] = liquidados_hogar_f['FECHA SINIESTRO'].dt.month
-                liquidados_hogar_f['MES'].value_counts().sort_index().plot(kind='bar', color='darkgreen', ax=ax)
-                plt.title('Reclamos de Hogar Liquidados por Mes')
-                plt.xlabel('Mes')
-                plt.ylabel('Cantidad de Reclamos')
-                st.pyplot(fig)
+                def grafico_mes_hogar():
+                    fig, ax = plt.subplots(figsize=(10, 4))
+                    liquidados_hogar_f['FECHA SINIESTRO'].dt.month.value_counts().sort_index().plot(kind='bar', color='darkgreen', ax=ax)
+                    plt.title('Reclamos de Hogar Liquidados por Mes')
+                    plt.xlabel('Mes')
+                    plt.ylabel('Cantidad de Reclamos')
+                    return fig
+                mostrar_figura(clave_vista_hogar + ('mes',), grafico_mes_hogar)
                 
                 # Métricas principales
                 col1,col4,col2,col3 = st.columns(4)
                 
                 liquidados_hogar_f['TIEMPO_RESPUESTA'] = (liquidados_hogar_f['FECHA NOTIFICACION SINIESTRO'] - liquidados_hogar_f['FECHA SINIESTRO']).dt.days
                 liquidados_hogar_f['TIEMPO_CIERRE'] = (liquidados_hogar_f['FECHA DE CIERRE/INDEMNIZACION'] - liquidados_hogar_f['FECHA NOTIFICACION SINIESTRO']).dt.days
+                kpis_hogar = resultado_vista(clave_vista_hogar + ('kpis',), lambda: {
+                    'total': len(df_hogar_filtrado),
+                    'notificacion': liquidados_hogar_f['TIEMPO_RESPUESTA'].mean(),
+                    'negados': len(negados_hogar_f),
+                    'en_proceso': len(procesados_hogar_f),
+                    'pendientes': len(pendientes_hogar_f),
+                    'reclamado_en_proceso': procesados_hogar_f['VALOR RECLAMADO'].sum(),
+                    'reclamado_pendiente': pendientes_hogar_f['VALOR RECLAMADO'].sum(),
+                    'indemnizado': liquidados_hogar_f['VALOR INDEMNIZADO'].sum(),
+                    'cierre': liquidados_hogar_f['TIEMPO_CIERRE'].mean(),
+                    'valor_promedio': liquidados_hogar_f['VALOR INDEMNIZADO'].mean(),
+                    'reclamado': df_hogar_filtrado['VALOR RECLAMADO'].sum(),
+                })
                 
                 with col1:
-                    total_reclamos=len(df_hogar_filtrado)
-                    st.metric("Total Reclamos", total_reclamos)
-                    st.metric("Días promedio notificación de liquidados", f"{liquidados_hogar_f['TIEMPO_RESPUESTA'].mean():.1f} días")
+                    st.metric("Total Reclamos", kpis_hogar['total'])
+                    st.metric("Días promedio notificación de liquidados", f"{kpis_hogar['notificacion']:.1f} días")
                 
                 with col4:
-                    total_negados=len(negados_hogar_f)
-                    total_proceso=len(procesados_hogar_f)
-                    total_pendiente=len(pendientes_hogar_f)
-                    st.metric("Total Reclamos Negados", total_negados)
-                    st.metric("Total Reclamos en Proceso", total_proceso)
-                    st.metric("Total Reclamado Pendiente", total_pendiente)
-                    st.metric("Valor Total Reclamado en Proceso", f"${procesados_hogar_f['VALOR RECLAMADO'].sum():,.2f}")
-                    st.metric("Valor Total Reclamado Pendiente", f"${pendientes_hogar_f['VALOR RECLAMADO'].sum():,.2f}")
+                    st.metric("Total Reclamos Negados", kpis_hogar['negados'])
+                    st.metric("Total Reclamos en Proceso", kpis_hogar['en_proceso'])
+                    st.metric("Total Reclamado Pendiente", kpis_hogar['pendientes'])
+                    st.metric("Valor Total Reclamado en Proceso", f"${kpis_hogar['reclamado_en_proceso']:,.2f}")
+                    st.metric("Valor Total Reclamado Pendiente", f"${kpis_hogar['reclamado_pendiente']:,.2f}")
 
                     
                 
                 with col2:
-                    st.metric("Valor Total Indemnizado", f"${liquidados_hogar_f['VALOR INDEMNIZADO'].sum():,.2f}")
-                    st.metric("Días promedio cierre", f"{liquidados_hogar_f['TIEMPO_CIERRE'].mean():.1f} días")
+                    st.metric("Valor Total Indemnizado", f"${kpis_hogar['indemnizado']:,.2f}")
+                    st.metric("Días promedio cierre", f"{kpis_hogar['cierre']:.1f} días")
                 
                 with col3:
-                    st.metric("Valor Promedio", f"${liquidados_hogar_f['VALOR INDEMNIZADO'].mean():,.2f}")
-                    st.metric("Valor Total Reclamado", f"${df_hogar_filtrado['VALOR RECLAMADO'].sum():,.2f}")
+                    st.metric("Valor Promedio", f"${kpis_hogar['valor_promedio']:,.2f}")
+                    st.metric("Valor Total Reclamado", f"${kpis_hogar['reclamado']:,.2f}")
                 
                 # Distribución de valores indemnizados
                 st.header("💰 Análisis de Valores Indemnizados")
                 
-                fig = plt.figure(figsize=(10, 5))
-                sns.histplot(liquidados_hogar_f['VALOR INDEMNIZADO'], bins=bins_hist_hogar, kde=True, color='darkblue')
-                plt.title('Distribución de Valores Indemnizados')
-                plt.xlabel('Valor Indemnizado')
-                plt.ylabel('Frecuencia')
-                st.pyplot(fig)
+                def grafico_valores_hogar():
+                    fig = plt.figure(figsize=(10, 5))
+                    sns.histplot(liquidados_hogar_f['VALOR INDEMNIZADO'], bins=bins_hist_hogar, kde=True, color='darkblue')
+                    plt.title('Distribución de Valores Indemnizados')
+                    plt.xlabel('Valor Indemnizado')
+                    plt.ylabel('Frecuencia')
+                    return fig
+                mostrar_figura(clave_vista_hogar + ('valores', bins_hist_hogar), grafico_valores_hogar)
                 
                 # Análisis de causas
                 st.header("🌧️ Análisis de Causas de Siniestros")
                 
-                top_causas_hogar = liquidados_hogar_f['CAUSA SINIESTRO'].value_counts().nlargest(top_n_hogar)
-                fig, ax = plt.subplots(figsize=(10, 5))
-                sns.barplot(x=top_causas_hogar.values, y=top_causas_hogar.index, palette='Blues_r')
-                plt.title(f'Top {top_n_hogar} Causas de Siniestros de Hogar')
-                plt.xlabel('Cantidad de Reclamos')
-                st.pyplot(fig)
+                def grafico_causas_hogar():
+                    top_causas_hogar = liquidados_hogar_f['CAUSA SINIESTRO'].value_counts().nlargest(top_n_hogar)
+                    fig, ax = plt.subplots(figsize=(10, 5))
+                    sns.barplot(x=top_causas_hogar.values, y=top_causas_hogar.index, palette='Blues_r')
+                    plt.title(f'Top {top_n_hogar} Causas de Siniestros de Hogar')
+                    plt.xlabel('Cantidad de Reclamos')
+                    return fig
+                mostrar_figura(clave_vista_hogar + ('causas', top_n_hogar), grafico_causas_hogar)
                 
                 # Análisis temporal
                 st.header("⏱️ Análisis de Tiempos de Respuesta")
@@ -469,24 +1047,28 @@ with tab2:
                 col_t1, col_t2 = st.columns(2)
                 
                 with col_t1:
-                    fig = plt.figure(figsize=(10, 5))
-                    sns.histplot(liquidados_hogar_f['TIEMPO_RESPUESTA'].dropna(), bins=20, kde=True, color='orange')
-                    plt.title('Distribución - Días hasta Notificación')
-                    plt.xlabel('Días')
-                    plt.ylabel('Frecuencia')
-                    st.pyplot(fig)
+                    def grafico_notificacion_hogar():
+                        fig = plt.figure(figsize=(10, 5))
+                        sns.histplot(liquidados_hogar_f['TIEMPO_RESPUESTA'].dropna(), bins=20, kde=True, color='orange')
+                        plt.title('Distribución - Días hasta Notificación')
+                        plt.xlabel('Días')
+                        plt.ylabel('Frecuencia')
+                        return fig
+                    mostrar_figura(clave_vista_hogar + ('notificacion',), grafico_notificacion_hogar)
                 
                 with col_t2:
-                    fig = plt.figure(figsize=(10, 5))
-                    sns.histplot(liquidados_hogar_f['TIEMPO_CIERRE'].dropna(), bins=20, kde=True, color='red')
-                    plt.title('Distribución - Días hasta Cierre')
-                    plt.xlabel('Días')
-                    plt.ylabel('Frecuencia')
-                    st.pyplot(fig)
+                    def grafico_cierre_hogar():
+                        fig = plt.figure(figsize=(10, 5))
+                        sns.histplot(liquidados_hogar_f['TIEMPO_CIERRE'].dropna(), bins=20, kde=True, color='red')
+                        plt.title('Distribución - Días hasta Cierre')
+                        plt.xlabel('Días')
+                        plt.ylabel('Frecuencia')
+                        return fig
+                    mostrar_figura(clave_vista_hogar + ('cierre',), grafico_cierre_hogar)
                 
                 # Tabla resumen de estadísticas
                 with st.expander("📊 Ver estadísticas detalladas de tiempos"):
-                    stats_df = pd.DataFrame({
+                    stats_df = resultado_vista(clave_vista_hogar + ('tiempos',), lambda: pd.DataFrame({
                         'Métrica': ['Notificación', 'Cierre'],
                         'Promedio (días)': [
                             liquidados_hogar_f['TIEMPO_RESPUESTA'].mean(),
@@ -504,7 +1086,7 @@ with tab2:
                             liquidados_hogar_f['TIEMPO_RESPUESTA'].max(),
                             liquidados_hogar_f['TIEMPO_CIERRE'].max()
                         ]
-                    })
+                    }))
                     st.dataframe(stats_df.style.format({
                         'Promedio (días)': '{:.1f}',
                         'Mediana (días)': '{:.1f}',
@@ -515,9 +1097,24 @@ with tab2:
             else:
                 st.info("No hay reclamos liquidados para los filtros seleccionados")
             
+            # Scorecards (todos los estados de los filtros, haya o no liquidados)
+            if ('AGENCIA' in df_hogar_filtrado.columns or 'ASESOR' in df_hogar_filtrado.columns) and not df_hogar_filtrado.empty:
+                st.header("🏢 Scorecards de Agencias y Asesores")
+                if 'AGENCIA' in df_hogar_filtrado.columns:
+                    mostrar_scorecards(df_hogar_filtrado, 'AGENCIA', clave="agencia_hogar", titulo="🏢 Scorecard por Agencia",
+                                       clave_resultado=clave_vista_hogar)
+                if 'ASESOR' in df_hogar_filtrado.columns:
+                    mostrar_scorecards(df_hogar_filtrado, 'ASESOR', clave="asesor_hogar", titulo="🧑‍💼 Scorecard por Asesor",
+                                       clave_resultado=clave_vista_hogar)
+            
+            # Reclamos atípicos (puntaje calculado una vez sobre todo el dataset)
+            puntajes_hogar = calcular_puntajes_anomalia(df_hogar, hash_hogar, 'hogar')
+            mostrar_atipicos(puntajes_hogar, año=año_analisis_hogar, producto=producto_sel_hogar,
+                             titulo="Reclamos de Hogar Atípicos")
+            
             # Reclamos negados y en proceso
-            visualizar_estadisticas_pendientes(negados_hogar_f, titulo="Reclamos de Hogar Negados")
-            visualizar_estadisticas_pendientes(procesados_hogar_f, titulo="Reclamos de Hogar en Proceso")
+            visualizar_estadisticas_pendientes(negados_hogar_f, titulo="Reclamos de Hogar Negados", clave_vista=clave_vista_hogar)
+            visualizar_estadisticas_pendientes(procesados_hogar_f, titulo="Reclamos de Hogar en Proceso", clave_vista=clave_vista_hogar)
             
             # Datos crudos
             st.header("📄 Datos Crudos - Hogar")
@@ -532,16 +1129,14 @@ with tab3:
     st.header("Análisis de Cuota Protegida")
     uploaded_file_cuota = st.file_uploader("Sube tu archivo Excel - Cuota Protegida", type=["xlsx", "xls"], key="cuota")
 
-    if uploaded_file_cuota:
-        df_cuota = load_data(uploaded_file_cuota)
+    hash_cuota = obtener_hash_dataset(uploaded_file_cuota, "ds_cuota")
+
+    if hash_cuota:
+        df_cuota = load_data(hash_cuota, FECHAS_CUOTA)
         
         if df_cuota is not None:
             st.success("Datos de Cuota Protegida cargados correctamente ✅")
             
-            # Procesar fechas
-            df_cuota['FECHA SINIESTRO'] = pd.to_datetime(df_cuota['FECHA SINIESTRO'], errors='coerce')
-            df_cuota['FECHA NOTIFICACION SINIESTRO'] = pd.to_datetime(df_cuota['FECHA NOTIFICACION SINIESTRO'], errors='coerce')
-            
             # Sidebar controls
             with st.sidebar:
                 st.header("⚙️ Configuración - Cuota Protegida")
@@ -549,15 +1144,15 @@ with tab3:
                 # Filtro de año con opción "Todos"
                 años_disponibles = sorted(df_cuota['FECHA SINIESTRO'].dt.year.unique())
                 años_opciones = ['Todos'] + años_disponibles
-                año_analisis_cuota = st.selectbox("Seleccionar Año", años_opciones, key="año_cuota")
+                año_analisis_cuota = st.selectbox("Seleccionar Año", años_opciones, index=indice_url("año_cuota", años_opciones), key="año_cuota")
                 
-                top_n_cuota = st.slider("Top N Causas", 3, 10, 5, key="top_cuota")
-                bins_hist_cuota = st.slider("Bins para Histograma", 10, 100, 30, key="bins_cuota")
+                top_n_cuota = st.slider("Top N Causas", 3, 10, valor_url("top_cuota", 5, 3, 10), key="top_cuota")
+                bins_hist_cuota = st.slider("Bins para Histograma", 10, 100, valor_url("bins_cuota", 30, 10, 100), key="bins_cuota")
                 
                 # Filtro por producto
                 df_cuota['BASE'] = df_cuota['BASE'].fillna('No especificado').str.upper()
                 productos_cuota = ['Todas'] + sorted(df_cuota['BASE'].unique().tolist())
-                producto_sel_cuota = st.selectbox("Seleccionar Producto", productos_cuota, key="prod_cuota")
+                producto_sel_cuota = st.selectbox("Seleccionar Producto", productos_cuota, index=indice_url("prod_cuota", productos_cuota), key="prod_cuota")
             
             # Aplicar filtros
             df_cuota_filtrado = df_cuota.copy()
@@ -569,6 +1164,7 @@ with tab3:
             # Filtrar por producto solo si no es "Todas"
             if producto_sel_cuota != 'Todas':
                 df_cuota_filtrado = df_cuota_filtrado[df_cuota_filtrado['BASE'] == producto_sel_cuota]
+            clave_vista_cuota = ('cuota', hash_cuota, año_analisis_cuota, producto_sel_cuota)
 
             # Separar por estado (usando datos ya filtrados)
             liquidados_cuota_f = df_cuota_filtrado[df_cuota_filtrado['ESTADO'] == 'LIQUIDADO']
@@ -580,105 +1176,111 @@ with tab3:
             
             if not liquidados_cuota_f.empty:
                 # Gráfico temporal
-                fig, ax = plt.subplots(figsize=(10, 4))
-                liquidados_cuota_f['MES'] = liquidados_cuota_f['FECHA SINIESTRO'].dt.month
-                liquidados_cuota_f['MES'].value_counts().sort_index().plot(kind='bar', color='steelblue', ax=ax)
-                plt.title('Reclamos de Cuota Protegida Liquidados por Mes')
-                plt.xlabel('Mes')
-                plt.ylabel('Cantidad de Reclamos')
-                st.pyplot(fig)
+                def grafico_mes_cuota():
+                    fig, ax = plt.subplots(figsize=(10, 4))
+                    liquidados_cuota_f['FECHA SINIESTRO'].dt.month.value_counts().sort_index().plot(kind='bar', color='steelblue', ax=ax)
+                    plt.title('Reclamos de Cuota Protegida Liquidados por Mes')
+                    plt.xlabel('Mes')
+                    plt.ylabel('Cantidad de Reclamos')
+                    return fig
+                mostrar_figura(clave_vista_cuota + ('mes',), grafico_mes_cuota)
                 
                 # Métricas principales
                 col1, col2, col3 = st.columns(3)
                 
                 liquidados_cuota_f['TIEMPO_RESPUESTA'] = (liquidados_cuota_f['FECHA NOTIFICACION SINIESTRO'] - liquidados_cuota_f['FECHA SINIESTRO']).dt.days
+                kpis_cuota = resultado_vista(clave_vista_cuota + ('kpis',), lambda: {
+                    'total': len(liquidados_cuota_f),
+                    'notificacion': liquidados_cuota_f['TIEMPO_RESPUESTA'].mean(),
+                    'indemnizado': liquidados_cuota_f['VALOR INDEMNIZADO'].sum(),
+                    'edad': liquidados_cuota_f['EDAD'].mean() if 'EDAD' in liquidados_cuota_f.columns else None,
+                    'valor_promedio': liquidados_cuota_f['VALOR INDEMNIZADO'].mean(),
+                    'plazo': liquidados_cuota_f['PLAZO'].mean() if 'PLAZO' in liquidados_cuota_f.columns else None,
+                })
                 
                 with col1:
-                    st.metric("Total Reclamos", f"{len(liquidados_cuota_f):,}")
-                    st.metric("Días promedio notificación", f"{liquidados_cuota_f['TIEMPO_RESPUESTA'].mean():.1f} días")
+                    st.metric("Total Reclamos", f"{kpis_cuota['total']:,}")
+                    st.metric("Días promedio notificación", f"{kpis_cuota['notificacion']:.1f} días")
                 
                 with col2:
-                    st.metric("Valor Total Indemnizado", f"${liquidados_cuota_f['VALOR INDEMNIZADO'].sum():,.2f}")
-                    if 'EDAD' in liquidados_cuota_f.columns:
-                        st.metric("Edad Promedio", f"{liquidados_cuota_f['EDAD'].mean():.1f} años")
+                    st.metric("Valor Total Indemnizado", f"${kpis_cuota['indemnizado']:,.2f}")
+                    if kpis_cuota['edad'] is not None:
+                        st.metric("Edad Promedio", f"{kpis_cuota['edad']:.1f} años")
                 
                 with col3:
-                    st.metric("Valor Promedio", f"${liquidados_cuota_f['VALOR INDEMNIZADO'].mean():.2f}")
-                    if 'PLAZO' in liquidados_cuota_f.columns:
-                        st.metric("Plazo Promedio Crédito", f"{liquidados_cuota_f['PLAZO'].mean():.1f} meses")
+                    st.metric("Valor Promedio", f"${kpis_cuota['valor_promedio']:.2f}")
+                    if kpis_cuota['plazo'] is not None:
+                        st.metric("Plazo Promedio Crédito", f"{kpis_cuota['plazo']:.1f} meses")
                 
                 # Distribución de valores indemnizados
                 st.header("💰 Análisis de Valores Indemnizados")
                 
-                fig = plt.figure(figsize=(10, 5))
-                sns.histplot(liquidados_cuota_f['VALOR INDEMNIZADO'], bins=bins_hist_cuota, kde=True, color='mediumseagreen')
-                plt.title('Distribución de Valores Indemnizados - Cuota Protegida')
-                plt.xlabel('Valor Indemnizado')
-                plt.ylabel('Frecuencia')
-                st.pyplot(fig)
+                def grafico_valores_cuota():
+                    fig = plt.figure(figsize=(10, 5))
+                    sns.histplot(liquidados_cuota_f['VALOR INDEMNIZADO'], bins=bins_hist_cuota, kde=True, color='mediumseagreen')
+                    plt.title('Distribución de Valores Indemnizados - Cuota Protegida')
+                    plt.xlabel('Valor Indemnizado')
+                    plt.ylabel('Frecuencia')
+                    return fig
+                mostrar_figura(clave_vista_cuota + ('valores', bins_hist_cuota), grafico_valores_cuota)
                 
                 # Análisis de causas
                 st.header("🔍 Análisis de Causas de Siniestros")
                 
-                top_causas_cuota = liquidados_cuota_f['CAUSA SINIESTRO'].value_counts().nlargest(top_n_cuota)
-                fig, ax = plt.subplots(figsize=(10, 5))
-                sns.barplot(x=top_causas_cuota.values, y=top_causas_cuota.index, palette='Greens_r')
-                plt.title(f'Top {top_n_cuota} Causas de Siniestros - Cuota Protegida')
-                plt.xlabel('Cantidad de Reclamos')
-                st.pyplot(fig)
+                def grafico_causas_cuota():
+                    top_causas_cuota = liquidados_cuota_f['CAUSA SINIESTRO'].value_counts().nlargest(top_n_cuota)
+                    fig, ax = plt.subplots(figsize=(10, 5))
+                    sns.barplot(x=top_causas_cuota.values, y=top_causas_cuota.index, palette='Greens_r')
+                    plt.title(f'Top {top_n_cuota} Causas de Siniestros - Cuota Protegida')
+                    plt.xlabel('Cantidad de Reclamos')
+                    return fig
+                mostrar_figura(clave_vista_cuota + ('causas', top_n_cuota), grafico_causas_cuota)
                 
                 # Análisis de parentesco si existe
                 if 'PARENTESCO' in liquidados_cuota_f.columns:
                     st.header("👪 Distribución por Parentesco")
-                    fig, ax = plt.subplots(figsize=(8, 6))
-                    sns.countplot(y='PARENTESCO', data=liquidados_cuota_f, 
-                                order=liquidados_cuota_f['PARENTESCO'].value_counts().index)
-                    plt.title('Distribución de Reclamos por Parentesco')
-                    st.pyplot(fig)
+                    def grafico_parentesco_cuota():
+                        fig, ax = plt.subplots(figsize=(8, 6))
+                        sns.countplot(y='PARENTESCO', data=liquidados_cuota_f, 
+                                    order=liquidados_cuota_f['PARENTESCO'].value_counts().index)
+                        plt.title('Distribución de Reclamos por Parentesco')
+                        return fig
+                    mostrar_figura(clave_vista_cuota + ('parentesco',), grafico_parentesco_cuota)
                 
                 # Distribución de Edades si existe
                 if 'EDAD' in liquidados_cuota_f.columns:
                     st.subheader("👥 Distribución de Edades")
-                            
-                    bins = [0, 20, 25, 30, 35, 40, 45, 50, 55, 60, 65, 70, 75, 80, 85, 120]
-                    labels = [
-                        '0-20', '20-25', '25-30', '30-35', '35-40', 
-                        '40-45', '45-50', '50-55', '55-60', '60-65',
-                        '65-70', '70-75', '75-80', '80-85', '85+'
-                    ]
-                    
-                    liquidados_cuota_f['GRUPO_EDAD'] = pd.cut(
-                        liquidados_cuota_f['EDAD'],
-                        bins=bins,
-                        labels=labels,
-                        right=False
-                    )
-                    
-                    distribucion_edades_cuota = liquidados_cuota_f['GRUPO_EDAD'].value_counts().sort_index()
                     
-                    fig, ax = plt.subplots(figsize=(12, 6))
-                    sns.barplot(
-                        x=distribucion_edades_cuota.index,
-                        y=distribucion_edades_cuota.values,
-                        palette="YlGn",
-                        ax=ax
+                    distribucion_edades_cuota = resultado_vista(
+                        clave_vista_cuota + ('distribucion_edades',),
+                        lambda: distribuir_edades(liquidados_cuota_f['EDAD'])
                     )
                     
-                    plt.title('Distribución de Edades por Grupo - Cuota Protegida', fontsize=14)
-                    plt.xlabel('Grupo de Edad', fontsize=12)
-                    plt.ylabel('Cantidad de Casos', fontsize=12)
-                    plt.xticks(rotation=45)
-                    
-                    for p in ax.patches:
-                        ax.annotate(
-                            f'{int(p.get_height())}', 
-                            (p.get_x() + p.get_width() / 2., p.get_height()),
-                            ha='center', va='center', 
-                            xytext=(0, 5), 
-                            textcoords='offset points'
+                    def grafico_edades_cuota():
+                        fig, ax = plt.subplots(figsize=(12, 6))
+                        sns.barplot(
+                            x=distribucion_edades_cuota.index,
+                            y=distribucion_edades_cuota.values,
+                            palette="YlGn",
+                            ax=ax
                         )
+                        
+                        plt.title('Distribución de Edades por Grupo - Cuota Protegida', fontsize=14)
+                        plt.xlabel('Grupo de Edad', fontsize=12)
+                        plt.ylabel('Cantidad de Casos', fontsize=12)
+                        plt.xticks(rotation=45)
+                        
+                        for p in ax.patches:
+                            ax.annotate(
+                                f'{int(p.get_height())}', 
+                                (p.get_x() + p.get_width() / 2., p.get_height()),
+                                ha='center', va='center', 
+                                xytext=(0, 5), 
+                                textcoords='offset points'
+                            )
+                        return fig
                     
-                    st.pyplot(fig)
+                    mostrar_figura(clave_vista_cuota + ('edades',), grafico_edades_cuota)
                     
                     with st.expander("📊 Ver datos detallados por grupo de edad"):
                         st.dataframe(
@@ -692,56 +1294,62 @@ with tab3:
                 if 'AGENCIA' in liquidados_cuota_f.columns:
                     st.subheader("📍 Análisis de Agencias")
                     
-                    distribucion_agencias_cuota = liquidados_cuota_f['AGENCIA'].value_counts().sort_index()
-                    fig, ax = plt.subplots(figsize=(12, 6))
-                    sns.barplot(
-                        x=distribucion_agencias_cuota.index,
-                        y=distribucion_agencias_cuota.values,
-                        palette="YlGn",
-                        ax=ax
-                    )
-                    
-                    plt.title('Reclamos por Agencias - Cuota Protegida', fontsize=14)
-                    plt.xlabel('Agencia', fontsize=12)
-                    plt.ylabel('Cantidad de Casos', fontsize=12)
-                    plt.xticks(rotation=45)
-                    st.pyplot(fig)
+                    def grafico_agencias_cuota():
+                        distribucion_agencias_cuota = liquidados_cuota_f['AGENCIA'].value_counts().sort_index()
+                        fig, ax = plt.subplots(figsize=(12, 6))
+                        sns.barplot(
+                            x=distribucion_agencias_cuota.index,
+                            y=distribucion_agencias_cuota.values,
+                            palette="YlGn",
+                            ax=ax
+                        )
+                        
+                        plt.title('Reclamos por Agencias - Cuota Protegida', fontsize=14)
+                        plt.xlabel('Agencia', fontsize=12)
+                        plt.ylabel('Cantidad de Casos', fontsize=12)
+                        plt.xticks(rotation=45)
+                        return fig
+                    mostrar_figura(clave_vista_cuota + ('agencias',), grafico_agencias_cuota)
                 
                 # Análisis de asesores si existe
                 if 'ASESOR' in liquidados_cuota_f.columns:
-                    distribucion_asesores_cuota = liquidados_cuota_f['ASESOR'].value_counts().sort_index()
-                    fig, ax = plt.subplots(figsize=(12, 6))
-                    sns.barplot(
-                        x=distribucion_asesores_cuota.index,
-                        y=distribucion_asesores_cuota.values,
-                        palette="YlGn",
-                        ax=ax
-                    )
-                    plt.title('Reclamos por Asesor - Cuota Protegida', fontsize=14)
-                    plt.xlabel('Asesor', fontsize=12)
-                    plt.ylabel('Cantidad de Casos', fontsize=12)
-                    plt.xticks(rotation=45)
-                    st.pyplot(fig)
+                    def grafico_asesores_cuota():
+                        distribucion_asesores_cuota = liquidados_cuota_f['ASESOR'].value_counts().sort_index()
+                        fig, ax = plt.subplots(figsize=(12, 6))
+                        sns.barplot(
+                            x=distribucion_asesores_cuota.index,
+                            y=distribucion_asesores_cuota.values,
+                            palette="YlGn",
+                            ax=ax
+                        )
+                        plt.title('Reclamos por Asesor - Cuota Protegida', fontsize=14)
+                        plt.xlabel('Asesor', fontsize=12)
+                        plt.ylabel('Cantidad de Casos', fontsize=12)
+                        plt.xticks(rotation=45)
+                        return fig
+                    mostrar_figura(clave_vista_cuota + ('asesores',), grafico_asesores_cuota)
                 
                 # Análisis temporal
                 st.header("⏱️ Análisis de Tiempos de Respuesta")
                 
-                fig = plt.figure(figsize=(10, 5))
-                sns.histplot(liquidados_cuota_f['TIEMPO_RESPUESTA'].dropna(), bins=20, kde=True, color='teal')
-                plt.title('Distribución - Días hasta Notificación')
-                plt.xlabel('Días')
-                plt.ylabel('Frecuencia')
-                st.pyplot(fig)
+                def grafico_notificacion_cuota():
+                    fig = plt.figure(figsize=(10, 5))
+                    sns.histplot(liquidados_cuota_f['TIEMPO_RESPUESTA'].dropna(), bins=20, kde=True, color='teal')
+                    plt.title('Distribución - Días hasta Notificación')
+                    plt.xlabel('Días')
+                    plt.ylabel('Frecuencia')
+                    return fig
+                mostrar_figura(clave_vista_cuota + ('notificacion',), grafico_notificacion_cuota)
                 
                 # Tabla resumen de estadísticas
                 with st.expander("📊 Ver estadísticas detalladas de tiempos"):
-                    stats_df = pd.DataFrame({
+                    stats_df = resultado_vista(clave_vista_cuota + ('tiempos',), lambda: pd.DataFrame({
                         'Métrica': ['Notificación'],
                         'Promedio (días)': [liquidados_cuota_f['TIEMPO_RESPUESTA'].mean()],
                         'Mediana (días)': [liquidados_cuota_f['TIEMPO_RESPUESTA'].median()],
                         'Mínimo (días)': [liquidados_cuota_f['TIEMPO_RESPUESTA'].min()],
                         'Máximo (días)': [liquidados_cuota_f['TIEMPO_RESPUESTA'].max()]
-                    })
+                    }))
                     st.dataframe(stats_df.style.format({
                         'Promedio (días)': '{:.1f}',
                         'Mediana (días)': '{:.1f}',
@@ -752,9 +1360,24 @@ with tab3:
             else:
                 st.info("No hay reclamos liquidados para los filtros seleccionados")
             
+            # Scorecards (todos los estados de los filtros, haya o no liquidados)
+            if ('AGENCIA' in df_cuota_filtrado.columns or 'ASESOR' in df_cuota_filtrado.columns) and not df_cuota_filtrado.empty:
+                st.header("🏢 Scorecards de Agencias y Asesores")
+                if 'AGENCIA' in df_cuota_filtrado.columns:
+                    mostrar_scorecards(df_cuota_filtrado, 'AGENCIA', clave="agencia_cuota", titulo="🏢 Scorecard por Agencia",
+                                       clave_resultado=clave_vista_cuota)
+                if 'ASESOR' in df_cuota_filtrado.columns:
+                    mostrar_scorecards(df_cuota_filtrado, 'ASESOR', clave="asesor_cuota", titulo="🧑‍💼 Scorecard por Asesor",
+                                       clave_resultado=clave_vista_cuota)
+            
+            # Reclamos atípicos (puntaje calculado una vez sobre todo el dataset)
+            puntajes_cuota = calcular_puntajes_anomalia(df_cuota, hash_cuota, 'cuota')
+            mostrar_atipicos(puntajes_cuota, año=año_analisis_cuota, producto=producto_sel_cuota,
+                             titulo="Reclamos de Cuota Protegida Atípicos")
+            
             # Reclamos negados y en proceso
-            visualizar_estadisticas_pendientes(negados_cuota_f, titulo="Reclamos de Cuota Protegida Negados")
-            visualizar_estadisticas_pendientes(procesados_cuota_f, titulo="Reclamos de Cuota Protegida en Proceso")
+            visualizar_estadisticas_pendientes(negados_cuota_f, titulo="Reclamos de Cuota Protegida Negados", clave_vista=clave_vista_cuota)
+            visualizar_estadisticas_pendientes(procesados_cuota_f, titulo="Reclamos de Cuota Protegida en Proceso", clave_vista=clave_vista_cuota)
             
             # Datos crudos
             st.header("📄 Datos Crudos - Cuota Protegida")
@@ -764,3 +1387,6 @@ with tab3:
             st.warning("No se pudo cargar el archivo. Verifica el formato.")
     else:
         st.info("👋 Por favor sube un archivo Excel de Cuota Protegida para comenzar")
+
+# Guardar dataset y filtros actuales en la URL para compartir la vista
+sincronizar_url()
@@ -0,0 +1,468 @@
+"""
+Autenticación de la app de reclamos.
+
+- Credenciales en un archivo JSON local (usuario -> hash PBKDF2-SHA256 con sal).
+- Tokens de sesión firmados con HMAC, guardados en una cookie del navegador
+  (nunca en la URL), para que una pestaña o reconexión no vuelva a pedir la
+  contraseña mientras el token no expire. Los tokens revocados al cerrar
+  sesión se guardan en disco y siguen revocados tras reiniciar el servidor.
+- Límite de intentos fallidos por usuario y por IP. Sin más configuración se
+  usa la IP de la conexión e X-Forwarded-For se ignora (el cliente puede
+  falsificarla). Detrás de un proxy inverso esa IP es la del proxy, así que
+  todos los usuarios compartirían el límite: quien opere la app detrás de un
+  proxy debe definir RECLAMOS_PROXY_CONFIABLE para que se use la última
+  entrada de X-Forwarded-For (la que agrega el proxy).
+
+El backend es intercambiable: cualquier clase con el método
+``autenticar(usuario, contraseña) -> bool`` puede indicarse en la variable de
+entorno RECLAMOS_BACKEND_AUTH como ``modulo:Clase``.
+
+Uso desde la terminal:
+    python credenciales.py agregar <usuario>
+    python credenciales.py eliminar <usuario>
+    python credenciales.py benchmark --concurrencia 8
+    python credenciales.py calibrar --objetivo-ms 200 --concurrencia 8
+"""
+import argparse
+import base64
+import getpass
+import hashlib
+import hmac
+import importlib
+import json
+import os
+import secrets
+import statistics
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+DIRECTORIO_APP = os.path.dirname(os.path.abspath(__file__))
+RUTA_USUARIOS = os.environ.get("RECLAMOS_USUARIOS", os.path.join(DIRECTORIO_APP, "usuarios.json"))
+RUTA_SECRETO = os.environ.get("RECLAMOS_SECRETO_SESION_ARCHIVO", os.path.join(DIRECTORIO_APP, ".secreto_sesion"))
+RUTA_REVOCADOS = os.environ.get("RECLAMOS_SESIONES_REVOCADAS", os.path.join(DIRECTORIO_APP, ".sesiones_revocadas"))
+
+# Costo del hash. Cada hash guarda sus propias iteraciones. Si no se fija
+# RECLAMOS_ITERACIONES_HASH, al crear el primer usuario se calibra en la máquina
+# que ejecuta el comando para que el login quede bajo OBJETIVO_LOGIN_MS con
+# CONCURRENCIA_LOGIN logins simultáneos, y los usuarios siguientes reutilizan
+# ese valor. Lo recomendable es ejecutar `calibrar` en el servidor y fijar la
+# variable; por debajo de ITERACIONES_RECOMENDADAS se muestra una advertencia.
+ITERACIONES = int(os.environ["RECLAMOS_ITERACIONES_HASH"]) if "RECLAMOS_ITERACIONES_HASH" in os.environ else None
+OBJETIVO_LOGIN_MS = 200
+CONCURRENCIA_LOGIN = 8
+MIN_ITERACIONES = 10_000
+ITERACIONES_RECOMENDADAS = 100_000
+ALGORITMO = "pbkdf2_sha256"
+
+DURACION_SESION = 8 * 3600
+MAX_INTENTOS = 5
+VENTANA_INTENTOS = 300
+MAX_CLAVES_INTENTOS = 10_000
+
+
+def hashear_contraseña(contraseña: str, iteraciones: int) -> str:
+    """
+    Devuelve el hash con sal en formato ``pbkdf2_sha256$iteraciones$sal$hash``.
+    """
+    sal = secrets.token_bytes(16)
+    digest = hashlib.pbkdf2_hmac("sha256", contraseña.encode("utf-8"), sal, iteraciones)
+    return "$".join([
+        ALGORITMO,
+        str(iteraciones),
+        base64.b64encode(sal).decode("ascii"),
+        base64.b64encode(digest).decode("ascii"),
+    ])
+
+
+def iteraciones_de(almacenado: str) -> int:
+    """
+    Iteraciones con las que se generó un hash almacenado (0 si no es válido).
+    """
+    try:
+        return int(almacenado.split("$")[1])
+    except (IndexError, ValueError):
+        return 0
+
+
+def verificar_contraseña(contraseña: str, almacenado: str) -> bool:
+    """
+    Compara la contraseña con el hash almacenado en tiempo constante.
+    """
+    try:
+        algoritmo, iteraciones, sal, esperado = almacenado.split("$")
+    except ValueError:
+        return False
+    if algoritmo != ALGORITMO:
+        return False
+    digest = hashlib.pbkdf2_hmac(
+        "sha256", contraseña.encode("utf-8"), base64.b64decode(sal), int(iteraciones)
+    )
+    return hmac.compare_digest(digest, base64.b64decode(esperado))
+
+
+class BackendArchivo:
+    """
+    Backend por defecto: lee los hashes desde un archivo JSON y lo recarga
+    cuando cambia en disco.
+    """
+
+    def __init__(self, ruta: str = RUTA_USUARIOS):
+        self.ruta = ruta
+        self._usuarios = {}
+        self._modificado = None
+        self._candado = threading.Lock()
+        self._hash_ficticio = None
+
+    def _cargar(self) -> dict:
+        try:
+            modificado = os.path.getmtime(self.ruta)
+        except OSError:
+            return {}
+        with self._candado:
+            if modificado != self._modificado:
+                with open(self.ruta, encoding="utf-8") as archivo:
+                    self._usuarios = json.load(archivo)
+                self._modificado = modificado
+            return self._usuarios
+
+    def tiene_usuarios(self) -> bool:
+        return bool(self._cargar())
+
+    def huella(self, usuario: str):
+        """
+        Versión de la credencial del usuario (prefijo del hash de su hash
+        almacenado), o None si ya no existe. Cambia al cambiar la contraseña.
+        """
+        almacenado = self._cargar().get(usuario)
+        if almacenado is None:
+            return None
+        return hashlib.sha256(almacenado.encode("utf-8")).hexdigest()[:16]
+
+    def iteraciones_en_uso(self):
+        """
+        Iteraciones configuradas o, si no, las de los usuarios existentes
+        (None si aún no hay usuarios).
+        """
+        if ITERACIONES:
+            return ITERACIONES
+        return max((iteraciones_de(h) for h in self._cargar().values()), default=None)
+
+    def autenticar(self, usuario: str, contraseña: str) -> bool:
+        almacenado = self._cargar().get(usuario)
+        if almacenado is None:
+            # Hash de referencia para que un usuario inexistente tarde lo mismo
+            iteraciones = self.iteraciones_en_uso() or MIN_ITERACIONES
+            if self._hash_ficticio is None or iteraciones_de(self._hash_ficticio) != iteraciones:
+                self._hash_ficticio = hashear_contraseña(secrets.token_hex(8), iteraciones)
+            verificar_contraseña(contraseña, self._hash_ficticio)
+            return False
+        return verificar_contraseña(contraseña, almacenado)
+
+    def guardar(self, usuario: str, contraseña: str) -> int:
+        """
+        Crea o actualiza el usuario. Devuelve las iteraciones usadas, calibradas
+        en este servidor si es el primer usuario y no hay valor configurado.
+        """
+        iteraciones = self.iteraciones_en_uso() or calibrar()
+        usuarios = dict(self._cargar())
+        usuarios[usuario] = hashear_contraseña(contraseña, iteraciones)
+        self._escribir(usuarios)
+        return iteraciones
+
+    def eliminar(self, usuario: str) -> bool:
+        usuarios = dict(self._cargar())
+        if usuarios.pop(usuario, None) is None:
+            return False
+        self._escribir(usuarios)
+        return True
+
+    def _escribir(self, usuarios: dict):
+        temporal = f"{self.ruta}.tmp"
+        descriptor = os.open(temporal, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(descriptor, "w", encoding="utf-8") as archivo:
+            json.dump(usuarios, archivo, indent=2, sort_keys=True)
+        os.replace(temporal, self.ruta)
+
+
+def crear_backend():
+    """
+    Crea el backend configurado en RECLAMOS_BACKEND_AUTH (``modulo:Clase``)
+    o, por defecto, el backend de archivo.
+    """
+    ruta_clase = os.environ.get("RECLAMOS_BACKEND_AUTH")
+    if not ruta_clase:
+        return BackendArchivo()
+    modulo, clase = ruta_clase.split(":")
+    return getattr(importlib.import_module(modulo), clase)()
+
+
+def _leer_secreto() -> bytes:
+    secreto = os.environ.get("RECLAMOS_SECRETO_SESION")
+    if secreto:
+        return secreto.encode("utf-8")
+    if not os.path.exists(RUTA_SECRETO):
+        descriptor = os.open(RUTA_SECRETO, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+        with os.fdopen(descriptor, "wb") as archivo:
+            archivo.write(secrets.token_bytes(32))
+    with open(RUTA_SECRETO, "rb") as archivo:
+        return archivo.read()
+
+
+class FirmadorSesiones:
+    """
+    Emite y valida tokens de sesión ``usuario|expira|nonce|huella`` firmados
+    con HMAC. Validar un token no requiere volver a hashear la contraseña.
+
+    Si el backend tiene el método ``huella(usuario)``, el token incluye la
+    versión de la credencial y deja de ser válido cuando el usuario se elimina
+    o cambia su contraseña.
+    """
+
+    def __init__(self, secreto: bytes = None, duracion: int = DURACION_SESION, ruta_revocados: str = RUTA_REVOCADOS,
+                 backend=None):
+        self._secreto = secreto or _leer_secreto()
+        self.backend = backend
+        self.duracion = duracion
+        self.ruta_revocados = ruta_revocados
+        self._revocados = {}
+        self._modificado = None
+        self._candado = threading.Lock()
+
+    def _firmar(self, carga: bytes) -> str:
+        firma = hmac.new(self._secreto, carga, hashlib.sha256).digest()
+        return base64.urlsafe_b64encode(firma).decode("ascii").rstrip("=")
+
+    def _leer_token(self, token: str):
+        """
+        Devuelve (usuario, expira, nonce, huella) si la firma es válida, o None.
+        """
+        try:
+            carga_b64, firma = token.split(".")
+            carga = base64.urlsafe_b64decode(carga_b64 + "=" * (-len(carga_b64) % 4))
+            usuario, expira, nonce, huella = carga.decode("utf-8").split("|")
+            expira = int(expira)
+        except (ValueError, UnicodeDecodeError):
+            return None
+        if not hmac.compare_digest(firma, self._firmar(carga)):
+            return None
+        return usuario, expira, nonce, huella
+
+    def _huella(self, usuario: str):
+        # Backends sin `huella` no permiten verificar la credencial: huella vacía
+        if self.backend is None or not hasattr(self.backend, "huella"):
+            return ""
+        return self.backend.huella(usuario)
+
+    def _cargar_revocados(self) -> dict:
+        # Se recarga si otro proceso del servidor revocó tokens
+        try:
+            modificado = os.path.getmtime(self.ruta_revocados)
+        except OSError:
+            return self._revocados
+        if modificado != self._modificado:
+            with open(self.ruta_revocados, encoding="utf-8") as archivo:
+                self._revocados = json.load(archivo)
+            self._modificado = modificado
+        return self._revocados
+
+    def emitir(self, usuario: str) -> str:
+        expira = int(time.time()) + self.duracion
+        huella = self._huella(usuario) or ""
+        carga = f"{usuario}|{expira}|{secrets.token_hex(8)}|{huella}".encode("utf-8")
+        return base64.urlsafe_b64encode(carga).decode("ascii").rstrip("=") + "." + self._firmar(carga)
+
+    def validar(self, token: str):
+        """
+        Devuelve el usuario del token, o None si es inválido, expiró, fue
+        revocado o la credencial del usuario cambió o se eliminó.
+        """
+        datos = self._leer_token(token)
+        if datos is None:
+            return None
+        usuario, expira, nonce, huella = datos
+        if expira < time.time():
+            return None
+        actual = self._huella(usuario)
+        if actual is None or not hmac.compare_digest(huella, actual):
+            return None
+        with self._candado:
+            if nonce in self._cargar_revocados():
+                return None
+        return usuario
+
+    def revocar(self, token: str):
+        """
+        Revoca el token hasta su expiración, también tras reiniciar el servidor.
+        """
+        datos = self._leer_token(token)
+        if datos is None:
+            return
+        _, expira, nonce, _ = datos
+        ahora = time.time()
+        with self._candado:
+            # Los tokens ya expirados no necesitan seguir en la lista
+            revocados = {n: e for n, e in self._cargar_revocados().items() if e > ahora}
+            revocados[nonce] = expira
+            temporal = f"{self.ruta_revocados}.{os.getpid()}.tmp"
+            descriptor = os.open(temporal, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+            with os.fdopen(descriptor, "w", encoding="utf-8") as archivo:
+                json.dump(revocados, archivo)
+            os.replace(temporal, self.ruta_revocados)
+            self._revocados = revocados
+            self._modificado = os.path.getmtime(self.ruta_revocados)
+
+
+class LimitadorIntentos:
+    """
+    Bloquea una clave (usuario o IP) tras MAX_INTENTOS fallos dentro de la ventana.
+    """
+
+    def __init__(self, max_intentos: int = MAX_INTENTOS, ventana: int = VENTANA_INTENTOS,
+                 max_claves: int = MAX_CLAVES_INTENTOS):
+        self.max_intentos = max_intentos
+        self.ventana = ventana
+        self.max_claves = max_claves
+        self._fallos = {}
+        self._candado = threading.Lock()
+
+    def segundos_bloqueo(self, clave: str) -> float:
+        """
+        Segundos que faltan para poder volver a intentar (0 si no está bloqueada).
+        """
+        ahora = time.time()
+        with self._candado:
+            fallos = [t for t in self._fallos.get(clave, []) if t > ahora - self.ventana]
+            if fallos:
+                self._fallos[clave] = fallos
+            else:
+                self._fallos.pop(clave, None)
+            if len(fallos) < self.max_intentos:
+                return 0
+            return fallos[0] + self.ventana - ahora
+
+    def registrar_fallo(self, clave: str):
+        ahora = time.time()
+        with self._candado:
+            # Se reinserta al final para que el orden del dict sea el del último fallo
+            fallos = self._fallos.pop(clave, [])
+            fallos.append(ahora)
+            self._fallos[clave] = fallos
+            if len(self._fallos) > self.max_claves:
+                self._podar(ahora)
+
+    def _podar(self, ahora: float):
+        """
+        Descarta claves sin fallos dentro de la ventana y, si aún sobran,
+        las de fallo más antiguo.
+        """
+        for clave in [c for c, f in self._fallos.items() if f[-1] <= ahora - self.ventana]:
+            del self._fallos[clave]
+        while len(self._fallos) > self.max_claves:
+            del self._fallos[next(iter(self._fallos))]
+
+    def reiniciar(self, clave: str):
+        with self._candado:
+            self._fallos.pop(clave, None)
+
+
+def medir_login(iteraciones: int, concurrencia: int = CONCURRENCIA_LOGIN, logins: int = 64) -> dict:
+    """
+    Mide la latencia de verificación con `concurrencia` logins simultáneos.
+
+    Returns:
+        dict: Latencias p50, p95 y máxima en milisegundos
+    """
+    almacenado = hashear_contraseña("benchmark", iteraciones)
+
+    def login(_):
+        inicio = time.perf_counter()
+        verificar_contraseña("benchmark", almacenado)
+        return (time.perf_counter() - inicio) * 1000
+
+    with ThreadPoolExecutor(max_workers=concurrencia) as ejecutor:
+        latencias = sorted(ejecutor.map(login, range(logins)))
+    return {
+        "p50_ms": statistics.median(latencias),
+        "p95_ms": latencias[int(0.95 * (len(latencias) - 1))],
+        "max_ms": latencias[-1],
+    }
+
+
+def calibrar(objetivo_ms: float = OBJETIVO_LOGIN_MS, concurrencia: int = CONCURRENCIA_LOGIN) -> int:
+    """
+    Mayor número de iteraciones (múltiplo de 10.000, mínimo MIN_ITERACIONES)
+    cuyo p95 con la concurrencia dada queda bajo el objetivo.
+    """
+    referencia = medir_login(MIN_ITERACIONES, concurrencia, concurrencia * 4)["p95_ms"]
+    iteraciones = max(MIN_ITERACIONES, int(MIN_ITERACIONES * objetivo_ms / referencia) // 10_000 * 10_000)
+    while iteraciones > MIN_ITERACIONES and medir_login(iteraciones, concurrencia, concurrencia * 4)["p95_ms"] > objetivo_ms:
+        iteraciones -= 10_000
+    return iteraciones
+
+
+def advertir_iteraciones(iteraciones: int):
+    """
+    Avisa por stderr si las iteraciones quedan por debajo del mínimo recomendado.
+    """
+    if iteraciones < ITERACIONES_RECOMENDADAS:
+        print(
+            f"⚠️ {iteraciones} iteraciones quedan por debajo de las {ITERACIONES_RECOMENDADAS} recomendadas "
+            f"para PBKDF2-SHA256 (la máquina es lenta o estaba cargada). Ejecuta "
+            f"`python credenciales.py calibrar` en el servidor donde corre la app y fija "
+            f"RECLAMOS_ITERACIONES_HASH explícitamente (si el servidor no alcanza el objetivo, "
+            f"usa al menos {ITERACIONES_RECOMENDADAS} y acepta un login más lento).",
+            file=sys.stderr,
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Administración de credenciales de la app de reclamos")
+    subparsers = parser.add_subparsers(dest="comando", required=True)
+
+    agregar = subparsers.add_parser("agregar", help="Crear o actualizar un usuario")
+    agregar.add_argument("usuario")
+    eliminar = subparsers.add_parser("eliminar", help="Eliminar un usuario")
+    eliminar.add_argument("usuario")
+    benchmark = subparsers.add_parser("benchmark", help="Medir la latencia de login")
+    benchmark.add_argument("--iteraciones", type=int, help="Por defecto, las que usan los usuarios actuales")
+    benchmark.add_argument("--concurrencia", type=int, default=CONCURRENCIA_LOGIN)
+    benchmark.add_argument("--logins", type=int, default=64)
+    calibrar_parser = subparsers.add_parser("calibrar", help="Sugerir iteraciones para un objetivo de latencia")
+    calibrar_parser.add_argument("--objetivo-ms", type=float, default=OBJETIVO_LOGIN_MS)
+    calibrar_parser.add_argument("--concurrencia", type=int, default=CONCURRENCIA_LOGIN)
+    args = parser.parse_args()
+
+    if args.comando == "agregar":
+        contraseña = getpass.getpass("Contraseña: ")
+        if contraseña != getpass.getpass("Repetir contraseña: "):
+            parser.error("Las contraseñas no coinciden")
+        backend = BackendArchivo()
+        if backend.iteraciones_en_uso() is None:
+            print(f"Calibrando el costo del hash en esta máquina (p95 < {OBJETIVO_LOGIN_MS} ms con "
+                  f"{CONCURRENCIA_LOGIN} logins simultáneos). Si no es el servidor de la app, "
+                  f"cancela y fija RECLAMOS_ITERACIONES_HASH con `calibrar` en el servidor...")
+        iteraciones = backend.guardar(args.usuario, contraseña)
+        print(f"Usuario '{args.usuario}' guardado en {RUTA_USUARIOS} ({iteraciones} iteraciones)")
+        advertir_iteraciones(iteraciones)
+    elif args.comando == "eliminar":
+        if not BackendArchivo().eliminar(args.usuario):
+            parser.error(f"El usuario '{args.usuario}' no existe")
+        print(f"Usuario '{args.usuario}' eliminado")
+    elif args.comando == "benchmark":
+        iteraciones = args.iteraciones or BackendArchivo().iteraciones_en_uso()
+        if iteraciones is None:
+            parser.error("No hay usuarios; indica --iteraciones")
+        resultado = medir_login(iteraciones, args.concurrencia, args.logins)
+        print(f"{iteraciones} iteraciones, {args.concurrencia} logins simultáneos: "
+              f"p50 {resultado['p50_ms']:.0f} ms, p95 {resultado['p95_ms']:.0f} ms, máx {resultado['max_ms']:.0f} ms")
+    elif args.comando == "calibrar":
+        iteraciones = calibrar(args.objetivo_ms, args.concurrencia)
+        print(f"RECLAMOS_ITERACIONES_HASH={iteraciones} "
+              f"(p95 < {args.objetivo_ms:.0f} ms con {args.concurrencia} logins simultáneos)")
+        advertir_iteraciones(iteraciones)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,298 @@
+"""
+Prueba de carga de la app de reclamos.
+
+Simula N analistas concurrentes ejecutando app_reclamos3.py sin navegador con
+el AppTest de Streamlit. Cada sesión sube libros sintéticos de vida, hogar y
+cuota protegida y luego cambia año, producto, top N y bins al azar. Se mide la
+latencia de cada rerun (p50/p95), el CPU y la memoria (RSS) del proceso.
+
+Las sesiones corren como hilos de un mismo proceso, igual que en el servidor
+de Streamlit, así que comparten GIL y cachés (st.cache_data, gráficos). Por
+eso el CPU y la memoria no se pueden medir por sesión: se reportan el total
+del proceso y el promedio por sesión (CPU total / sesiones y crecimiento del
+pico de RSS / sesiones), que incluye lo que las sesiones comparten. El
+login no se mide aquí (ver `python credenciales.py benchmark`): las sesiones
+empiezan ya autenticadas.
+
+Uso:
+    python prueba_carga.py --sesiones 8 --interacciones 20 --filas 5000
+    python prueba_carga.py --sesiones 16 --datasets-compartidos --json resultado.json
+"""
+import argparse
+import io
+import json
+import os
+import random
+import shutil
+import sys
+import tempfile
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+DIRECTORIO_APP = os.path.dirname(os.path.abspath(__file__))
+RUTA_APP = os.path.join(DIRECTORIO_APP, "app_reclamos3.py")
+
+MIME_XLSX = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+TIPOS = ["vida", "hogar", "cuota"]
+
+# Widgets que cambia cada analista simulado y sus rangos
+SLIDERS = {"top": (3, 10), "bins": (10, 100)}
+
+
+def generar_libro(tipo: str, filas: int, semilla: int) -> bytes:
+    """
+    Genera un Excel sintético con las columnas que espera la pestaña del tipo dado.
+    """
+    rng = np.random.default_rng(semilla)
+    fecha_siniestro = pd.Timestamp("2022-01-01") + pd.to_timedelta(rng.integers(0, 3 * 365, filas), unit="D")
+    fecha_notificacion = fecha_siniestro + pd.to_timedelta(rng.integers(0, 90, filas), unit="D")
+    estado_pendiente = "PENDIENTE DOCUMENTOS" if tipo == "vida" else "PENDIENTE"
+
+    df = pd.DataFrame({
+        "FECHA SINIESTRO": fecha_siniestro,
+        "FECHA NOTIFICACION SINIESTRO": fecha_notificacion,
+        "ESTADO": rng.choice(["LIQUIDADO", "NEGADO", "EN PROCESO", estado_pendiente], filas, p=[0.6, 0.15, 0.15, 0.1]),
+        "BASE": rng.choice(["Producto A", "Producto B", "Producto C", None], filas),
+        "CAUSA SINIESTRO": rng.choice([f"Causa {i}" for i in range(15)], filas),
+        "AGENCIA": rng.choice([f"Agencia {i}" for i in range(20)], filas),
+        "ASESOR": rng.choice([f"Asesor {i}" for i in range(120)], filas),
+        "VALOR RECLAMADO": rng.gamma(2.0, 2500.0, filas).round(2),
+    })
+    df["VALOR INDEMNIZADO"] = (df["VALOR RECLAMADO"] * rng.uniform(0.4, 1.0, filas)).round(2)
+
+    if tipo in ("vida", "hogar"):
+        df["FECHA DE CIERRE/INDEMNIZACION"] = fecha_notificacion + pd.to_timedelta(rng.integers(1, 120, filas), unit="D")
+        df["INICIO VIGENCIA"] = fecha_siniestro - pd.to_timedelta(rng.integers(30, 720, filas), unit="D")
+        df["FIN VIGENCIA"] = df["INICIO VIGENCIA"] + pd.Timedelta(days=365)
+    if tipo in ("vida", "cuota"):
+        df["EDAD"] = rng.integers(18, 90, filas)
+        df["PLAZO"] = rng.integers(6, 120, filas)
+        df["PARENTESCO"] = rng.choice(["TITULAR", "CONYUGE", "HIJO"], filas)
+
+    buffer = io.BytesIO()
+    df.to_excel(buffer, index=False, engine="openpyxl")
+    return buffer.getvalue()
+
+
+def rss_mb() -> float:
+    """
+    Memoria residente actual del proceso en MB.
+    """
+    try:
+        with open("/proc/self/statm") as archivo:
+            return int(archivo.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20
+    except OSError:
+        import resource
+        # Fuera de Linux solo está disponible el pico (en bytes en macOS)
+        maximo = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return maximo / 2**20 if sys.platform == "darwin" else maximo / 1024
+
+
+class MonitorMemoria(threading.Thread):
+    """
+    Muestrea el RSS del proceso en segundo plano y guarda el pico.
+    """
+
+    def __init__(self, intervalo: float = 0.2):
+        super().__init__(daemon=True)
+        self.intervalo = intervalo
+        self.pico = rss_mb()
+        self._detener = threading.Event()
+
+    def run(self):
+        while not self._detener.is_set():
+            self.pico = max(self.pico, rss_mb())
+            self._detener.wait(self.intervalo)
+
+    def detener(self) -> float:
+        self._detener.set()
+        self.join()
+        return max(self.pico, rss_mb())
+
+
+class SesionSimulada:
+    """
+    Un analista: sube los tres libros y cambia filtros, registrando la
+    latencia de cada rerun como (acción, segundos).
+    """
+
+    def __init__(self, numero: int, libros: dict, interacciones: int, timeout: float):
+        from streamlit.testing.v1 import AppTest
+
+        self.numero = numero
+        self.libros = libros
+        self.interacciones = interacciones
+        self.rng = random.Random(numero)
+        self.latencias = []
+        self.errores = []
+        self.app = AppTest.from_file(RUTA_APP, default_timeout=timeout)
+        self.app.session_state["autenticado"] = True
+        self.app.session_state["usuario"] = f"analista_{numero}"
+
+    def _rerun(self, accion: str):
+        inicio = time.perf_counter()
+        self.app.run()
+        self.latencias.append((accion, time.perf_counter() - inicio))
+        self.errores.extend(str(excepcion.value) for excepcion in self.app.exception)
+
+    def _cambiar_filtro(self):
+        tipo = self.rng.choice(TIPOS)
+        filtro = self.rng.choice(["año", "prod", "top", "bins"])
+        clave = f"{filtro}_{tipo}"
+        if filtro in SLIDERS:
+            self.app.slider(key=clave).set_value(self.rng.randint(*SLIDERS[filtro]))
+        else:
+            selector = self.app.selectbox(key=clave)
+            selector.select_index(self.rng.randrange(len(selector.options)))
+        self._rerun(filtro)
+
+    def ejecutar(self, barrera: threading.Barrier):
+        barrera.wait()
+        try:
+            self._rerun("inicio")
+            for tipo in TIPOS:
+                nombre = f"{tipo}_{self.numero}.xlsx"
+                self.app.file_uploader(key=tipo).set_value((nombre, self.libros[tipo], MIME_XLSX))
+                self._rerun(f"carga_{tipo}")
+            for _ in range(self.interacciones):
+                self._cambiar_filtro()
+        except Exception as error:  # noqa: BLE001 - se reporta y la prueba sigue con las demás sesiones
+            self.errores.append(f"{type(error).__name__}: {error}")
+
+
+def percentiles(valores: list) -> dict:
+    segundos = np.asarray(valores)
+    return {
+        "n": int(segundos.size),
+        "p50_ms": float(np.percentile(segundos, 50) * 1000),
+        "p95_ms": float(np.percentile(segundos, 95) * 1000),
+        "max_ms": float(segundos.max() * 1000),
+    }
+
+
+def ejecutar_prueba(sesiones: int, interacciones: int, filas: int, datasets_compartidos: bool,
+                    timeout: float, semilla: int) -> dict:
+    """
+    Ejecuta la prueba de carga y devuelve el resumen de latencias y recursos.
+    """
+    from streamlit.testing.v1 import AppTest
+
+    # Libros sintéticos: uno por tipo compartido por todos, o uno por sesión
+    print(f"Generando libros sintéticos ({filas} filas)...", flush=True)
+    variantes = 1 if datasets_compartidos else sesiones
+    libros = [
+        {tipo: generar_libro(tipo, filas, semilla + 1000 * variante + indice) for indice, tipo in enumerate(TIPOS)}
+        for variante in range(variantes)
+    ]
+
+    # Calentamiento: importa matplotlib/seaborn y compila el script antes de medir
+    calentamiento = AppTest.from_file(RUTA_APP, default_timeout=timeout)
+    calentamiento.session_state["autenticado"] = True
+    calentamiento.run()
+
+    simuladas = [
+        SesionSimulada(numero, libros[numero % variantes], interacciones, timeout)
+        for numero in range(sesiones)
+    ]
+    barrera = threading.Barrier(sesiones + 1)
+    hilos = [threading.Thread(target=sesion.ejecutar, args=(barrera,)) for sesion in simuladas]
+
+    monitor = MonitorMemoria()
+    rss_inicial = rss_mb()
+    for hilo in hilos:
+        hilo.start()
+    monitor.start()
+    print(f"Ejecutando {sesiones} sesiones x {interacciones} interacciones...", flush=True)
+    barrera.wait()
+    inicio_pared, inicio_cpu = time.perf_counter(), time.process_time()
+    for hilo in hilos:
+        hilo.join()
+    duracion = time.perf_counter() - inicio_pared
+    cpu = time.process_time() - inicio_cpu
+    rss_pico = monitor.detener()
+
+    todas = [latencia for sesion in simuladas for latencia in sesion.latencias]
+    por_accion = {}
+    for accion, segundos in todas:
+        por_accion.setdefault(accion, []).append(segundos)
+    errores = [error for sesion in simuladas for error in sesion.errores]
+
+    return {
+        "sesiones": sesiones,
+        "interacciones": interacciones,
+        "filas": filas,
+        "datasets_compartidos": datasets_compartidos,
+        "nucleos": os.cpu_count(),
+        "duracion_s": duracion,
+        "reruns": len(todas),
+        "reruns_por_segundo": len(todas) / duracion,
+        "latencia": percentiles([segundos for _, segundos in todas]),
+        "latencia_por_accion": {accion: percentiles(valores) for accion, valores in sorted(por_accion.items())},
+        "cpu_s": cpu,
+        "cpu_promedio_por_sesion_s": cpu / sesiones,
+        "uso_cpu": cpu / duracion / (os.cpu_count() or 1),
+        "rss_inicial_mb": rss_inicial,
+        "rss_pico_mb": rss_pico,
+        "rss_promedio_por_sesion_mb": (rss_pico - rss_inicial) / sesiones,
+        "errores": errores,
+    }
+
+
+def imprimir_resumen(resultado: dict):
+    print()
+    print(f"Sesiones: {resultado['sesiones']}  |  Filas por libro: {resultado['filas']}  |  "
+          f"Datasets compartidos: {'sí' if resultado['datasets_compartidos'] else 'no'}  |  "
+          f"Núcleos: {resultado['nucleos']}")
+    print(f"Duración: {resultado['duracion_s']:.1f} s  |  Reruns: {resultado['reruns']} "
+          f"({resultado['reruns_por_segundo']:.2f}/s)")
+    print()
+    print(f"{'Acción':<14}{'n':>6}{'p50 (ms)':>12}{'p95 (ms)':>12}{'máx (ms)':>12}")
+    filas = list(resultado["latencia_por_accion"].items()) + [("TOTAL", resultado["latencia"])]
+    for accion, estadisticas in filas:
+        print(f"{accion:<14}{estadisticas['n']:>6}{estadisticas['p50_ms']:>12.0f}"
+              f"{estadisticas['p95_ms']:>12.0f}{estadisticas['max_ms']:>12.0f}")
+    print()
+    print(f"CPU: {resultado['cpu_s']:.1f} s en total, {resultado['cpu_promedio_por_sesion_s']:.1f} s promedio por sesión "
+          f"(uso medio {resultado['uso_cpu']:.0%} de los núcleos)")
+    print(f"RSS: {resultado['rss_inicial_mb']:.0f} MB al inicio, pico {resultado['rss_pico_mb']:.0f} MB, "
+          f"~{resultado['rss_promedio_por_sesion_mb']:.1f} MB promedio por sesión")
+    if resultado["errores"]:
+        print(f"\n⚠️ {len(resultado['errores'])} errores, por ejemplo: {resultado['errores'][0]}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Prueba de carga de la app de reclamos con sesiones simuladas")
+    parser.add_argument("--sesiones", type=int, default=4, help="Analistas concurrentes simulados")
+    parser.add_argument("--interacciones", type=int, default=10, help="Cambios de filtro por sesión")
+    parser.add_argument("--filas", type=int, default=2000, help="Filas de cada libro sintético")
+    parser.add_argument("--datasets-compartidos", action="store_true",
+                        help="Todas las sesiones suben los mismos libros (aprovechan la caché)")
+    parser.add_argument("--timeout", type=float, default=300, help="Tiempo máximo por rerun en segundos")
+    parser.add_argument("--semilla", type=int, default=0)
+    parser.add_argument("--json", help="Guardar el resultado completo en este archivo")
+    args = parser.parse_args()
+
+    # Los datasets subidos se registran en un directorio temporal propio de la prueba
+    directorio_temporal = None
+    if "RECLAMOS_DIR_DATASETS" not in os.environ:
+        directorio_temporal = tempfile.mkdtemp(prefix="prueba_carga_")
+        os.environ["RECLAMOS_DIR_DATASETS"] = directorio_temporal
+
+    try:
+        resultado = ejecutar_prueba(args.sesiones, args.interacciones, args.filas,
+                                    args.datasets_compartidos, args.timeout, args.semilla)
+    finally:
+        if directorio_temporal:
+            shutil.rmtree(directorio_temporal, ignore_errors=True)
+
+    imprimir_resumen(resultado)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as archivo:
+            json.dump(resultado, archivo, indent=2, ensure_ascii=False)
+
+
+if __name__ == "__main__":
+    main()